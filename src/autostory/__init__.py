@@ -1,12 +1,53 @@
 __version__ = "0.0.1"
 
-from .map_generators import raw
+from . import datamodels
+from .datamodels import Level
+from .map_generators import raw, unique_raws
 from .text_generators import MapBuilder
+from .parallel import render_parallel, generate_world
+from .layouts import Layout, reskin
+from .hierarchy import Estate
+from .constraints import Constraints, RawSampler
+from .deadlines import Deadline, DeadlineExceeded
+from .compression import compress, decompress
+from .cache import MapCache
+from .runtime import World
+from .profiling import profiled
+from . import tracing
 
 from pprint import pp
+from threading import Lock
+
+
+def topology_map(raw_data) -> datamodels.Map:
+    doors = {k.door: k for k in raw_data.keys}
+    passages = list()
+    for edge in raw_data.edges:
+        origin = edge.origin.identifier
+        destin = edge.destin.identifier
+        passages.append(datamodels.Passage(destin, origin, ''))
+        passages.append(datamodels.Passage(origin, destin, ''))
+
+    return datamodels.Map(
+            introducion_letter = '',
+            name = '',
+            descritption = '',
+            first_ambient = raw_data.initial.identifier,
+            ambients = tuple(datamodels.Ambient(v.identifier, '', (), ()) for v in raw_data.vertexes),
+            passages = tuple(passages),
+            keys = tuple(datamodels.Key(
+                door.destin.identifier,
+                key.position.identifier,
+                '',
+                door.origin.identifier,
+                ) for door, key in doors.items()),
+            )
+
+
+def build_map(raw_data, deadline = None, level = Level.FULL):
+    if level == Level.TOPOLOGY:
+        return topology_map(raw_data)
 
-def generate_json():
-    raw_data = raw(size = 3, size_factor = 5)
     builder = MapBuilder()
 
     locked_edges = {k.door: k for k in raw_data.keys}
@@ -17,9 +58,70 @@ def generate_json():
 
         builder.create_passage(origin, destin, locked_edges.get(edge))
 
+    if deadline is not None:
+        deadline.check('passages')
+
     for vertex in raw_data.vertexes:
         builder.create_ambient(vertex.identifier)
 
     builder.first_ambient = raw_data.initial.identifier
 
-    return builder.build().as_json()
+    if level == Level.NAMES:
+        return builder.build_names()
+    return builder.build(deadline)
+
+
+_FALLBACK_RAW = None
+_FALLBACK_MAPS = dict()
+_FALLBACK_LOCK = Lock()
+
+
+def fallback_map(level = Level.FULL):
+    # rendered once per level, so falling back never costs a generation
+    global _FALLBACK_RAW
+    if level not in _FALLBACK_MAPS:
+        with _FALLBACK_LOCK:
+            if level not in _FALLBACK_MAPS:
+                if _FALLBACK_RAW is None:
+                    _FALLBACK_RAW = raw(size = 3, size_factor = 4)
+                _FALLBACK_MAPS[level] = build_map(_FALLBACK_RAW, level = level)
+    return _FALLBACK_MAPS[level]
+
+
+@profiled('generate')
+def generate_map(sampler = None, timeout = None, deadline = None, fallback = False, level = Level.FULL):
+    if fallback:
+        # built before the timeout starts, the first request does not pay
+        # for it out of its own budget
+        fallback_map(level)
+    if deadline is None and timeout is not None:
+        deadline = Deadline(timeout)
+
+    try:
+        if sampler is None:
+            raw_data = raw(size = 3, size_factor = 5)
+        else:
+            raw_data = sampler.sample()
+        if deadline is not None:
+            deadline.check('raw')
+        return build_map(raw_data, deadline, level)
+    except DeadlineExceeded:
+        if not fallback:
+            raise
+        return fallback_map(level)
+
+
+def generate_json(sampler = None, timeout = None, deadline = None, fallback = False, level = Level.FULL):
+    _map = generate_map(sampler, timeout, deadline, fallback, level)
+    with tracing.span('serialize', format='json', ambients=len(_map.ambients)):
+        return _map.as_json()
+
+
+def generate_compressed(sampler = None, timeout = None, deadline = None, fallback = False, level = Level.FULL):
+    return compress(generate_map(sampler, timeout, deadline, fallback, level))
+
+
+def generate_batch(count, size = 3, size_factor = 5, seen = None, sampler = None):
+    sample = sampler.sample if sampler is not None else None
+    for raw_data in unique_raws(count, size, size_factor, seen=seen, sample=sample):
+        yield build_map(raw_data).as_json()
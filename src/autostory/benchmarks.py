@@ -0,0 +1,212 @@
+from time import perf_counter
+from typing import Callable, Dict, Sequence, NamedTuple, List
+from random import seed as reseed
+from statistics import median
+from pathlib import Path
+from argparse import ArgumentParser
+
+import json
+import platform
+import sys
+import tracemalloc
+
+from . import build_map, compress
+from .map_generators import raw
+from .text_generators import Context, location_names
+from .text_generators.text_generators import Map
+
+
+__doc__ = '''
+Latency, throughput and memory of the generation stages, checked against the
+baselines stored in the repository.
+
+    python -m autostory.benchmarks            # compare, exit 1 on a regression
+    python -m autostory.benchmarks --update   # store the current run
+
+A stage without a baseline fails the comparison too, a run with nothing to
+compare against would otherwise always pass.
+
+Every stage is run in several rounds, the spread of its throughput between
+rounds is its noise. A change is only a regression if it is larger than both
+a fixed tolerance and three times the noise of the baseline or of the run,
+whichever is the noisiest. Baselines depend on the machine, they should be
+updated from the one that checks them.
+'''
+
+
+# relative to the working directory, the make targets run from the root of
+# the repository, where the baselines are kept
+BASELINE = Path('benchmarks') / 'baseline.json'
+
+TOLERANCE = {'throughput': 0.10, 'p99': 0.25, 'p999': 0.50, 'peak_memory': 0.10}
+
+
+def percentiles(samples: Sequence[float], points = (50, 99, 99.9)) -> Dict[float, float]:
+    ordered = sorted(samples)
+    return {p: ordered[min(len(ordered) - 1, int(len(ordered)*p/100))] for p in points}
+
+
+class Measure(NamedTuple):
+    throughput: float   # runs per second
+    p99: float          # seconds
+    p999: float         # seconds, the 99.9th percentile
+    peak_memory: int    # bytes allocated at the peak of a single run
+    noise: float        # relative spread of the throughput between rounds
+
+
+class Change(NamedTuple):
+    stage: str
+    metric: str
+    old: float
+    new: float
+    regressed: bool
+
+    @property
+    def ratio(self) -> float:
+        return self.new/self.old - 1 if self.old else 0.0
+
+
+def measure(function: Callable[[], object], count, rounds = 5) -> Measure:
+    throughputs = list()
+    tails = list()
+    far_tails = list()
+    for i in range(rounds):
+        reseed(i)
+        samples = list()
+        for _ in range(count):
+            start = perf_counter()
+            function()
+            samples.append(perf_counter() - start)
+        throughputs.append(count/sum(samples))
+        points = percentiles(samples, (99, 99.9))
+        tails.append(points[99])
+        far_tails.append(points[99.9])
+
+    # traced separately, tracemalloc slows every allocation down
+    reseed(0)
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    middle = median(throughputs)
+    return Measure(
+            throughput = middle,
+            p99 = median(tails),
+            p999 = median(far_tails),
+            peak_memory = peak,
+            noise = median(abs(t - middle) for t in throughputs)/middle,
+            )
+
+
+def stages() -> Dict[str, Callable[[], Measure]]:
+    reseed(0)
+    names = location_names()
+    context = Context()
+    raw_data = raw(3, 5)
+    built = build_map(raw_data)
+
+    return {
+            'location_names': lambda: measure(lambda: next(names), 10000),
+            'Map.make': lambda: measure(lambda: Map.make(context), 1000),
+            'raw': lambda: measure(lambda: raw(3, 5), 1000),
+            'build_map': lambda: measure(lambda: build_map(raw_data), 20),
+            'as_json': lambda: measure(built.as_json, 200),
+            'compress': lambda: measure(lambda: compress(built), 200),
+            }
+
+
+def compare(baseline: Dict[str, Measure], current: Dict[str, Measure]) -> List[Change]:
+    changes = list()
+    for stage, new in current.items():
+        if stage not in baseline:
+            continue
+        old = baseline[stage]
+        noise = 3*max(old.noise, new.noise)
+        for metric, tolerance in TOLERANCE.items():
+            before, after = getattr(old, metric), getattr(new, metric)
+            tolerance = max(tolerance, noise) if metric != 'peak_memory' else tolerance
+            if metric == 'throughput':
+                regressed = after < before*(1 - tolerance)
+            else:
+                regressed = after > before*(1 + tolerance)
+            changes.append(Change(stage, metric, before, after, regressed))
+    return changes
+
+
+def report(changes: Sequence[Change], current: Dict[str, Measure], baseline: Dict[str, Measure]) -> str:
+    units = {
+            'throughput': lambda v: f'{v:.1f}/s',
+            'p99': lambda v: f'{v*1e6:.1f}us',
+            'p999': lambda v: f'{v*1e6:.1f}us',
+            'peak_memory': lambda v: f'{v/1024:.1f}KiB',
+            }
+    lines = list()
+    for stage in current:
+        if stage not in baseline:
+            lines.append(f'{stage}: no baseline')
+            continue
+        lines.append(f'{stage}:')
+        for change in (c for c in changes if c.stage == stage):
+            unit = units[change.metric]
+            mark = 'REGRESSION' if change.regressed else ''
+            lines.append(
+                    f'    {change.metric.ljust(12)} {unit(change.old).rjust(12)} -> '
+                    f'{unit(change.new).rjust(12)} {change.ratio:+7.1%} {mark}'.rstrip())
+    return '\n'.join(lines)
+
+
+def load(path) -> Dict[str, Measure]:
+    path = Path(path)
+    if not path.exists():
+        return dict()
+    data = json.loads(path.read_text())
+    if data.get('python') != platform.python_version():
+        print(f'baseline taken with python {data.get("python")}', file=sys.stderr)
+    return {stage: Measure(**m) for stage, m in data['stages'].items()}
+
+
+def store(path, measures: Dict[str, Measure]):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = {
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'stages': {stage: m._asdict() for stage, m in measures.items()},
+            }
+    path.write_text(json.dumps(data, indent=2) + '\n')
+
+
+def main(argv = None) -> int:
+    parser = ArgumentParser(prog='python -m autostory.benchmarks')
+    parser.add_argument('--update', action='store_true', help='store this run as the baseline')
+    parser.add_argument('--baseline', default=BASELINE, help='baseline file')
+    parser.add_argument('stages', nargs='*', help='stages to run, all by default')
+    args = parser.parse_args(argv)
+
+    available = stages()
+    selected = args.stages or list(available)
+    unknown = set(selected) - set(available)
+    if unknown:
+        parser.error(f'unknown stages: {", ".join(sorted(unknown))}')
+
+    current = {stage: available[stage]() for stage in selected}
+    baseline = load(args.baseline)
+
+    if args.update:
+        store(args.baseline, {**baseline, **current})
+        print(f'baseline stored in {args.baseline}')
+        return 0
+
+    changes = compare(baseline, current)
+    print(report(changes, current, baseline))
+    missing = [stage for stage in current if stage not in baseline]
+    if missing:
+        print(f'no baseline for {", ".join(missing)}, store one with --update', file=sys.stderr)
+    return 1 if missing or any(c.regressed for c in changes) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,129 @@
+from hashlib import blake2b
+from pathlib import Path
+from tempfile import mkstemp
+from typing import Callable
+
+import json
+import os
+import zlib
+
+from . import datamodels, __version__
+from .compression import compress, decompress
+from .parallel import generate_world
+from .text_generators import native_values, generation_base_data
+
+
+__doc__ = '''
+Maps generated from a seed, kept on disk so the same request is not
+generated twice.
+
+An entry is named after the hash of its seed, size, size factor and the
+content version, a hash of the package version and of every content table,
+so editing the vocabulary never serves maps written with the old one. The
+file holds the map in the `compression` format.
+
+Every file is written to a temporary name and moved into place with
+`os.replace`, so other processes sharing the directory see a whole entry
+or none. Reading an entry touches its mtime, when the directory grows past
+`max_bytes` the entries read the longest ago are removed. An entry that
+vanishes or can not be decoded is a miss.
+'''
+
+
+def _content_version() -> str:
+    digest = blake2b(__version__.encode(), digest_size=8)
+    for module in (native_values, generation_base_data):
+        for name, value in vars(module).items():
+            if name.startswith('_') and name.isupper():
+                digest.update(f'{name}={value!r}'.encode())
+    return digest.hexdigest()
+
+
+CONTENT_VERSION = _content_version()
+
+
+def _generate(seed, size, size_factor) -> datamodels.Map:
+    return generate_world(size, size_factor, seed, workers=1)
+
+
+class MapCache():
+
+    SUFFIX = '.map'
+
+    def __init__(self, directory, max_bytes = 256*1024*1024,
+            generate: Callable[[int, int, int], datamodels.Map] = _generate):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.generate = generate
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, seed, size, size_factor) -> Path:
+        key = json.dumps([seed, size, size_factor, CONTENT_VERSION])
+        return self.directory/(blake2b(key.encode(), digest_size=16).hexdigest() + self.SUFFIX)
+
+    def get(self, seed, size = 3, size_factor = 5) -> datamodels.Map:
+        path = self.path(seed, size, size_factor)
+        try:
+            data = path.read_bytes()
+            _map = decompress(data)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (ValueError, KeyError, TypeError, zlib.error):
+            # a damaged entry, or one that decodes to something other than a
+            # map, is dropped, the next put writes it again
+            self._remove(path)
+            self.misses += 1
+            return None
+
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        self.hits += 1
+        return _map
+
+    def put(self, seed, size, size_factor, _map: datamodels.Map):
+        handle, temporary = mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(handle, 'wb') as file:
+                file.write(compress(_map))
+            os.replace(temporary, self.path(seed, size, size_factor))
+        except BaseException:
+            self._remove(Path(temporary))
+            raise
+        self.evict()
+
+    def get_or_generate(self, seed, size = 3, size_factor = 5) -> datamodels.Map:
+        _map = self.get(seed, size, size_factor)
+        if _map is None:
+            _map = self.generate(seed, size, size_factor)
+            self.put(seed, size, size_factor, _map)
+        return _map
+
+    def evict(self):
+        entries = list()
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(self.SUFFIX):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(Path(path))
+            total -= size
+
+    @staticmethod
+    def _remove(path: Path):
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,126 @@
+from pathlib import Path
+from typing import Mapping, Dict
+
+import json
+import re
+import zlib
+
+from . import datamodels
+from . import tracing
+from .text_generators import native_values, generation_base_data
+
+
+__doc__ = '''
+Compact binary form of a map: its json, without indentation, deflated with
+a preset dictionary made of the words the generators write. A single map is
+too small for deflate to learn its vocabulary from the map itself, with the
+dictionary the very first description already refers back to it.
+
+The dictionaries are frozen, numbered files in `dictionaries/`, maps are
+compressed with the highest one. zlib writes the id of the dictionary, its
+adler32, in the header of the stream, and `decompress` picks the dictionary
+by it, so maps compressed with an older one still decode. The content tables
+can change freely, `freeze_dictionary` writes the next dictionary from them
+when the current one has drifted too far from what the generators write.
+'''
+
+
+# markup of the grammars, only the text between it ends up in a map
+_MARKUP = re.compile(r'#[^#]*#|\[[^\]]*\]')
+
+_WINDOW = 32*1024
+
+
+def _strings(value):
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, Mapping):
+        for item in value.values():
+            yield from _strings(item)
+    elif isinstance(value, (tuple, list)):
+        for item in value:
+            yield from _strings(item)
+
+
+def _fragments(*modules):
+    for module in modules:
+        for name, value in vars(module).items():
+            if not name.startswith('_') or not name.isupper():
+                continue
+            for string in _strings(value):
+                for fragment in _MARKUP.split(string):
+                    fragment = ' '.join(fragment.split())
+                    if len(fragment) > 1:
+                        yield fragment
+
+
+def _skeleton() -> str:
+    # the field names of every record, as they show up in the json
+    fields = list()
+    for model in (datamodels.Map, datamodels.Ambient, datamodels.Passage, datamodels.Key):
+        fields.extend(f'"{f}":' for f in model._fields)
+    return ''.join(dict.fromkeys(fields))
+
+
+def _dictionary() -> bytes:
+    # deflate reaches the end of the dictionary with the shortest distances,
+    # so what shows up the most goes last
+    vocabulary = dict.fromkeys(_fragments(native_values, generation_base_data))
+    dictionary = (' '.join(vocabulary) + _skeleton()).encode('utf-8')
+    return dictionary[-_WINDOW:]
+
+
+_DICTIONARIES = Path(__file__).resolve().parent/'dictionaries'
+
+
+def _frozen() -> Dict[int, bytes]:
+    # by zlib id, in version order
+    found = dict()
+    for path in sorted(_DICTIONARIES.glob('*.zdict'), key=lambda p: int(p.stem)):
+        data = path.read_bytes()
+        found[zlib.adler32(data)] = data
+    return found
+
+
+DICTIONARIES = _frozen()
+DICTIONARY = list(DICTIONARIES.values())[-1]
+
+
+def freeze_dictionary() -> Path:
+    '''Writes the dictionary of the current content tables as the next version'''
+    versions = [int(p.stem) for p in _DICTIONARIES.glob('*.zdict')]
+    path = _DICTIONARIES/f'{max(versions, default=0) + 1}.zdict'
+    path.write_bytes(_dictionary())
+    return path
+
+
+def _dictionary_of(data: bytes) -> bytes:
+    # FDICT, bit 5 of the second header byte, says the adler32 of the
+    # dictionary follows the two header bytes
+    if len(data) < 6 or not data[1] & 0x20:
+        return None
+    dictid = int.from_bytes(data[2:6], 'big')
+    if dictid not in DICTIONARIES:
+        raise ValueError(f'map data compressed with an unknown dictionary {dictid:08x}')
+    return DICTIONARIES[dictid]
+
+
+def compress(_map: datamodels.Map, level = 9) -> bytes:
+    with tracing.span('serialize', format='zlib', ambients=len(_map.ambients)) as span:
+        text = json.dumps(_map.as_dict(), ensure_ascii=False, separators=(',', ':'))
+        compressor = zlib.compressobj(level, zdict=DICTIONARY)
+        data = compressor.compress(text.encode('utf-8')) + compressor.flush()
+        span.set(bytes=len(data))
+        return data
+
+
+def decompress(data: bytes) -> datamodels.Map:
+    dictionary = _dictionary_of(data)
+    if dictionary is None:
+        decompressor = zlib.decompressobj()
+    else:
+        decompressor = zlib.decompressobj(zdict=dictionary)
+    text = decompressor.decompress(data) + decompressor.flush()
+    if not decompressor.eof:
+        raise ValueError('truncated map data')
+    return datamodels.Map.from_dict(json.loads(text))
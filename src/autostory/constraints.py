@@ -0,0 +1,98 @@
+from typing import NamedTuple
+from collections import defaultdict, deque
+
+from .map_generators import Raw, raw
+
+
+__doc__ = '''
+Graph level metrics of a raw map and the constraints generation can put on
+them. Everything here runs in linear time on the `Raw` output, so candidates
+that miss the targets are re-rolled before any text is generated.
+
+    shortest_path    steps from the initial to the final room, locks
+                     ignored: a lower bound of the walkthrough, which also
+                     goes after keys, see `solver.solve` for the real one
+    locked_doors     locked edges every walkthrough crosses
+    dead_end_ratio   rooms with a single passage over all rooms
+'''
+
+
+class Metrics(NamedTuple):
+    shortest_path: int
+    locked_doors: int
+    dead_end_ratio: float
+
+
+class Constraints(NamedTuple):
+    min_shortest_path: int = 0
+    min_locked_doors: int = 0
+    max_dead_end_ratio: float = 1.0
+
+    def accepts(self, _metrics: Metrics) -> bool:
+        return (_metrics.shortest_path >= self.min_shortest_path
+                and _metrics.locked_doors >= self.min_locked_doors
+                and _metrics.dead_end_ratio <= self.max_dead_end_ratio)
+
+
+def metrics(raw_data: Raw) -> Metrics:
+    adjacency = defaultdict(list)
+    for edge in raw_data.edges:
+        adjacency[edge.origin].append(edge)
+        adjacency[edge.destin].append(edge)
+
+    previous = {raw_data.initial: None}
+    queue = deque([raw_data.initial])
+    while queue and raw_data.final not in previous:
+        vertex = queue.popleft()
+        for edge in adjacency[vertex]:
+            other = edge.destin if edge.origin == vertex else edge.origin
+            if other not in previous:
+                previous[other] = edge
+                queue.append(other)
+
+    # locked edges link the areas as a tree, any walk to the final room
+    # crosses the same ones as the shortest
+    doors = {k.door for k in raw_data.keys}
+    shortest_path = 0
+    locked_doors = 0
+    vertex = raw_data.final
+    while previous[vertex] is not None:
+        edge = previous[vertex]
+        shortest_path += 1
+        locked_doors += edge in doors
+        vertex = edge.destin if edge.origin == vertex else edge.origin
+
+    dead_ends = sum(1 for v in raw_data.vertexes if len(adjacency[v]) == 1)
+
+    return Metrics(
+            shortest_path = shortest_path,
+            locked_doors = locked_doors,
+            dead_end_ratio = dead_ends/len(raw_data.vertexes),
+            )
+
+
+class RawSampler():
+
+    def __init__(self, constraints = Constraints(), size = 3, size_factor = 5, max_attempts = 1000):
+        self.constraints = constraints
+        self.size = size
+        self.size_factor = size_factor
+        self.max_attempts = max_attempts
+
+        self.attempts = 0
+        self.accepted = 0
+
+    @property
+    def acceptance_rate(self) -> float:
+        return self.accepted/self.attempts if self.attempts else 0.0
+
+    def sample(self) -> Raw:
+        for _ in range(self.max_attempts):
+            self.attempts += 1
+            raw_data = raw(self.size, self.size_factor)
+            if self.constraints.accepts(metrics(raw_data)):
+                self.accepted += 1
+                return raw_data
+        raise ValueError(
+                f'no map met {self.constraints} in {self.max_attempts} attempts, '
+                f'acceptance rate so far {self.acceptance_rate:.2%}')
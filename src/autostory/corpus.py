@@ -0,0 +1,223 @@
+from array import array
+from collections import Counter
+from hashlib import blake2b
+from math import log
+from typing import Iterable, Dict, List, Tuple
+
+from . import datamodels
+from .search import tokenize
+from .text_generators import generation_base_data
+
+
+__doc__ = '''
+Repetition and diversity of large corpora of maps, read as a stream, in
+memory that does not grow with the corpus.
+
+`Context.norepeat` keeps a single map from repeating itself, this measures
+what repeats between maps:
+
+    adjectives   how often each adjective of the content tables is used
+    bigrams      word pairs said twice in the same room description
+    intros       how many distinct introduction letters there are
+
+Frequencies are kept in count-min sketches, which never underestimate and
+overestimate by at most `e/width` of the total with probability
+`1 - exp(-depth)`, next to a bounded list of the most frequent items.
+Distinct counts are HyperLogLog estimates, within about `1.04/sqrt(2**p)`.
+Both hash with blake2b, so sketches of different processes can be merged.
+'''
+
+
+def _hash64(item: str) -> int:
+    return int.from_bytes(blake2b(item.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+class CountMinSketch():
+
+    def __init__(self, width = 2**14, depth = 4):
+        self.width = width
+        self.depth = depth
+        self.total = 0
+        self.table = [array('Q', bytes(8*width)) for _ in range(depth)]
+
+    def _columns(self, item):
+        # double hashing, every row from the two halves of one hash
+        h = _hash64(item)
+        first, second = h & 0xffffffff, h >> 32 | 1
+        return ((first + row*second) % self.width for row in range(self.depth))
+
+    def add(self, item, count = 1) -> int:
+        estimate = None
+        for row, column in zip(self.table, self._columns(item)):
+            row[column] += count
+            estimate = row[column] if estimate is None else min(estimate, row[column])
+        self.total += count
+        return estimate
+
+    def estimate(self, item) -> int:
+        return min(row[column] for row, column in zip(self.table, self._columns(item)))
+
+    def merge(self, other: 'CountMinSketch'):
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise ValueError('only sketches of the same shape can be merged')
+        for row, other_row in zip(self.table, other.table):
+            for column, count in enumerate(other_row):
+                row[column] += count
+        self.total += other.total
+
+
+class HyperLogLog():
+
+    def __init__(self, precision = 12):
+        if not 4 <= precision <= 16:
+            raise ValueError('precision must be between 4 and 16')
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, item):
+        h = _hash64(item)
+        index = h >> (64 - self.precision)
+        rest = h & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self) -> float:
+        m = len(self.registers)
+        alpha = 0.7213/(1 + 1.079/m)
+        estimate = alpha*m*m/sum(2.0**-r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5*m and zeros:
+            return m*log(m/zeros)
+        return estimate
+
+    def merge(self, other: 'HyperLogLog'):
+        if other.precision != self.precision:
+            raise ValueError('only counters of the same precision can be merged')
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+
+class _Top():
+    # the `size` items with the highest estimates seen so far
+
+    def __init__(self, size):
+        self.size = size
+        self.items: Dict[str, int] = dict()
+
+    def offer(self, item, estimate):
+        if item in self.items or len(self.items) < self.size:
+            self.items[item] = estimate
+            return
+        lowest = min(self.items, key=self.items.get)
+        if estimate > self.items[lowest]:
+            del self.items[lowest]
+            self.items[item] = estimate
+
+    def most_common(self) -> List[Tuple[str, int]]:
+        return sorted(self.items.items(), key=lambda i: (-i[1], i[0]))
+
+
+def _flavors(value):
+    if isinstance(value, generation_base_data._Flavor):
+        yield value
+    elif isinstance(value, (tuple, list)):
+        for item in value:
+            yield from _flavors(item)
+
+
+def _adjective_forms() -> Dict[str, Tuple[Tuple[str, ...], ...]]:
+    # every form of every adjective, as tokens, by its first token, the
+    # longest first so 'muito sujo' is not counted as 'muito' and 'sujo'
+    forms = set()
+    for name, value in vars(generation_base_data).items():
+        if name.startswith('_') and name.isupper():
+            for flavor in _flavors(value):
+                for adjective in flavor.adjectives:
+                    forms.update(tuple(tokenize(f)) for f in adjective if tokenize(f))
+    by_first = dict()
+    for form in sorted(forms, key=lambda f: (-len(f), f)):
+        by_first.setdefault(form[0], list()).append(form)
+    return {first: tuple(found) for first, found in by_first.items()}
+
+
+_ADJECTIVES = _adjective_forms()
+
+
+def adjectives(tokens) -> Iterable[str]:
+    i = 0
+    while i < len(tokens):
+        for form in _ADJECTIVES.get(tokens[i], ()):
+            if tuple(tokens[i:i + len(form)]) == form:
+                yield ' '.join(form)
+                i += len(form)
+                break
+        else:
+            i += 1
+
+
+class CorpusStats():
+
+    def __init__(self, width = 2**14, depth = 4, precision = 12, top = 20, max_repeats = 16):
+        self.maps = 0
+        self.rooms = 0
+        self.adjectives = CountMinSketch(width, depth)
+        self.distinct_adjectives = HyperLogLog(precision)
+        self.top_adjectives = _Top(top)
+        self.bigrams = CountMinSketch(width, depth)
+        self.top_bigrams = _Top(top)
+        # rooms by how many bigrams of their description are repeats
+        self.max_repeats = max_repeats
+        self.repeats = Counter()
+        self.intros = CountMinSketch(width, depth)
+        self.distinct_intros = HyperLogLog(precision)
+        self.top_intros = _Top(top)
+
+    def add(self, _map: datamodels.Map):
+        self.maps += 1
+        self.distinct_intros.add(_map.introducion_letter)
+        self.top_intros.offer(_map.introducion_letter, self.intros.add(_map.introducion_letter))
+
+        for ambient in _map.ambients:
+            self.rooms += 1
+            tokens = tokenize(ambient.descritption)
+
+            for adjective in adjectives(tokens):
+                self.distinct_adjectives.add(adjective)
+                self.top_adjectives.offer(adjective, self.adjectives.add(adjective))
+
+            said = Counter(zip(tokens, tokens[1:]))
+            repeated = 0
+            for bigram, times in said.items():
+                if times > 1:
+                    repeated += times - 1
+                    text = ' '.join(bigram)
+                    self.top_bigrams.offer(text, self.bigrams.add(text, times - 1))
+            self.repeats[min(repeated, self.max_repeats)] += 1
+
+    def consume(self, maps: Iterable[datamodels.Map]) -> 'CorpusStats':
+        for _map in maps:
+            self.add(_map)
+        return self
+
+    def report(self) -> dict:
+        rooms = self.rooms or 1
+        return {
+                'maps': self.maps,
+                'rooms': self.rooms,
+                'adjectives': {
+                    'total': self.adjectives.total,
+                    'distinct': round(self.distinct_adjectives.count()),
+                    'per_room': self.adjectives.total/rooms,
+                    'most_common': self.top_adjectives.most_common(),
+                    },
+                'bigram_repeats': {
+                    'rooms_by_repeats': dict(sorted(self.repeats.items())),
+                    'rooms_with_repeats': 1 - self.repeats[0]/rooms,
+                    'most_common': self.top_bigrams.most_common(),
+                    },
+                'intros': {
+                    'distinct': round(self.distinct_intros.count()),
+                    'distinct_ratio': min(1.0, self.distinct_intros.count()/(self.maps or 1)),
+                    'most_common': self.top_intros.most_common(),
+                    },
+                }
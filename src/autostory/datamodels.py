@@ -1,9 +1,16 @@
 from typing import NamedTuple
 from typing import Mapping, Tuple
+from enum import IntEnum
 
 import json
 
 
+class Level(IntEnum):
+    TOPOLOGY = 0  # ids and links only, every text field empty
+    NAMES = 1     # map name and the plain nouns of rooms, passages and keys
+    FULL = 2      # every description
+
+
 class Decoration(NamedTuple):
     descritption: str
 
@@ -18,6 +25,10 @@ class Key(NamedTuple):
     destination: str
     place: str
     descritption: str
+    # the room on the other side of the door, in the json of every map since
+    # it was added; keys of older maps have none, `runtime` then locks every
+    # passage to `destination` and `Layout.from_map` refuses them
+    origin: str = None
 
 
 class Ambient(NamedTuple):
@@ -49,3 +60,24 @@ class Map(NamedTuple):
 
     def as_json(self):
         return json.dumps(self.as_dict(), ensure_ascii=False, indent=2)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+                introducion_letter = data['introducion_letter'],
+                name = data['name'],
+                descritption = data['descritption'],
+                first_ambient = data['first_ambient'],
+                ambients = tuple(Ambient(
+                    id = a['id'],
+                    descritption = a['descritption'],
+                    passages = tuple(a['passages']),
+                    decorations = tuple(a['decorations']),
+                    ) for a in data['ambients']),
+                passages = tuple(Passage(**p) for p in data['passages']),
+                keys = tuple(Key(**k) for k in data['keys'])
+                )
+
+    @classmethod
+    def from_json(cls, text):
+        return cls.from_dict(json.loads(text))
@@ -0,0 +1,24 @@
+from time import monotonic
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+class Deadline():
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.expires = monotonic() + timeout
+
+    @property
+    def remaining(self) -> float:
+        return max(0.0, self.expires - monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return monotonic() >= self.expires
+
+    def check(self, stage):
+        if self.expired:
+            raise DeadlineExceeded(f'{self.timeout}s deadline exceeded during {stage}')
@@ -0,0 +1,96 @@
+from typing import NamedTuple, Tuple, Dict
+
+from .map_generators import Raw, Vertex, raw, derive_seed, seeded
+
+
+__doc__ = '''
+Nested maps, a building made of floors made of rooms and so on. Every level
+is a `raw` map, with its own partitions, area tree and keys, and every vertex
+of a level that is not the last one is a whole map of the level below it,
+entered through its `initial` vertex and left through its `final` one.
+
+Nothing below the root is generated until it is entered: the random state
+of a node is derived only from the estate seed and its path, so a node is
+the same whatever was visited before it, and the cost of an estate follows
+the part of it that was walked instead of its full size.
+'''
+
+
+class Shape(NamedTuple):
+    size: int = 3
+    size_factor: int = 4
+
+
+class Node():
+
+    def __init__(self, estate: 'Estate', path: Tuple[Vertex, ...] = tuple()):
+        self.estate = estate
+        self.path = path
+        self.__raw = None
+        self.__children: Dict[Vertex, 'Node'] = dict()
+
+    @property
+    def depth(self) -> int:
+        return len(self.path)
+
+    @property
+    def is_leaf(self) -> bool:
+        return self.depth == len(self.estate.shapes) - 1
+
+    @property
+    def raw(self) -> Raw:
+        if self.__raw is None:
+            self.__raw = self.estate._generate(self)
+        return self.__raw
+
+    @property
+    def expanded(self) -> bool:
+        return self.__raw is not None
+
+    def enter(self, vertex: Vertex) -> 'Node':
+        if self.is_leaf:
+            raise ValueError(f'{self.identifier(vertex)} is a room, it has no level below it')
+        if vertex not in self.raw.vertexes:
+            raise KeyError(vertex)
+        if vertex not in self.__children:
+            self.__children[vertex] = Node(self.estate, self.path + (vertex,))
+        return self.__children[vertex]
+
+    def identifier(self, vertex: Vertex) -> str:
+        return '/'.join(v.identifier for v in self.path + (vertex,))
+
+
+class Estate():
+
+    def __init__(self, seed, shapes = (Shape(), Shape())):
+        if not shapes:
+            raise ValueError('an estate needs at least one level')
+        self.seed = seed
+        self.shapes = tuple(Shape(*s) for s in shapes)
+        self.generated = 0
+        self.root = Node(self)
+
+    def _generate(self, node: Node) -> Raw:
+        # the global random state is given back, so expanding a node in the
+        # middle of something else does not change what comes after it
+        shape = self.shapes[node.depth]
+        with seeded(derive_seed(self.seed, 'level', *(v.identifier for v in node.path))):
+            raw_data = raw(shape.size, shape.size_factor)
+        self.generated += 1
+        return raw_data
+
+    def node(self, path) -> Node:
+        node = self.root
+        for vertex in path:
+            node = node.enter(vertex)
+        return node
+
+    def entrance(self) -> Tuple[Vertex, ...]:
+        '''Path to the room where the estate is entered'''
+        node = self.root
+        path = list()
+        while True:
+            path.append(node.raw.initial)
+            if node.is_leaf:
+                return tuple(path)
+            node = node.enter(node.raw.initial)
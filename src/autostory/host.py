@@ -0,0 +1,249 @@
+from argparse import ArgumentParser
+from random import choice, seed as reseed
+from time import perf_counter
+from typing import Mapping, Tuple
+
+import asyncio
+import json
+import tracemalloc
+
+from . import datamodels, savestate
+from .runtime import World, Session
+
+
+__doc__ = '''
+Serves play sessions over a line protocol from a single asyncio loop, the
+maps shared read only between all of them, so a session costs its
+connection and a `runtime.Session`.
+
+Every command is a line, every reply one line of json:
+
+    open <map> [room]       starts a session, replies as look
+    resume <map> <state>    starts from a `savestate` in hex
+    look                    {"room", "description", "exits", "keys"}
+    go <room>               moves, replies as look
+    take                    {"keys": [...]} picked up in the room
+    save                    {"state": "<hex>"}
+    quit                    closes the connection
+
+A failed command replies {"error": "..."} and the session goes on, so does
+a line that is not utf-8, its bad bytes replaced, or longer than the limit of
+the reader, 64 KiB by default.
+
+`LocalClient` talks to a host through in memory streams, the same protocol
+without sockets, for tests and for the benchmark:
+
+    python -m autostory.host --sessions 1000 --commands 100
+'''
+
+
+class SessionHost():
+
+    def __init__(self, maps: Mapping[str, datamodels.Map]):
+        self.worlds = {name: World(_map) for name, _map in maps.items()}
+        self.connections = 0
+        self.commands = 0
+        self.__commands = {
+                'open': self._open,
+                'resume': self._resume,
+                'look': self._look,
+                'go': self._go,
+                'take': self._take,
+                'save': self._save,
+                }
+
+    def _world(self, name) -> World:
+        try:
+            return self.worlds[name]
+        except KeyError:
+            raise ValueError(f'unknown map {name}') from None
+
+    @staticmethod
+    def _view(session: Session) -> dict:
+        view = session.look()
+        return {
+                'room': view.ambient.id,
+                'description': view.ambient.descritption,
+                'exits': [{
+                    'room': p.destination,
+                    'description': p.descritption,
+                    'locked': session.is_locked(p.destination),
+                    } for p in view.exits],
+                'keys': [k.descritption for k in view.keys],
+                }
+
+    def _open(self, session, argument) -> Tuple[Session, dict]:
+        name, _, room = argument.partition(' ')
+        session = self._world(name).session(room or None)
+        return session, self._view(session)
+
+    def _resume(self, session, argument) -> Tuple[Session, dict]:
+        name, _, state = argument.partition(' ')
+        session = savestate.load(self._world(name), bytes.fromhex(state))
+        return session, self._view(session)
+
+    def _look(self, session, argument) -> Tuple[Session, dict]:
+        return session, self._view(session)
+
+    def _go(self, session, argument) -> Tuple[Session, dict]:
+        session.move(argument)
+        return session, self._view(session)
+
+    def _take(self, session, argument) -> Tuple[Session, dict]:
+        return session, {'keys': [k.descritption for k in session.pick_up()]}
+
+    def _save(self, session, argument) -> Tuple[Session, dict]:
+        return session, {'state': savestate.save(session).hex()}
+
+    def execute(self, session: Session, line: str) -> Tuple[Session, dict]:
+        command, _, argument = line.strip().partition(' ')
+        self.commands += 1
+        if command not in self.__commands:
+            return session, {'error': f'unknown command {command}'}
+        if session is None and command not in ('open', 'resume'):
+            return session, {'error': 'no session, open one first'}
+        try:
+            return self.__commands[command](session, argument.strip())
+        except (ValueError, KeyError) as error:
+            return session, {'error': str(error)}
+
+    async def handle(self, reader, writer):
+        session = None
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    line = await reader.readuntil(b'\n')
+                except asyncio.IncompleteReadError as error:
+                    line = error.partial
+                except asyncio.LimitOverrunError:
+                    await _skip_line(reader)
+                    line = None
+                    reply = {'error': 'line too long'}
+                if line is not None:
+                    if not line or line.strip() == b'quit':
+                        break
+                    session, reply = self.execute(session, line.decode('utf-8', errors='replace'))
+                writer.write(json.dumps(reply, ensure_ascii=False).encode('utf-8') + b'\n')
+                await writer.drain()
+        finally:
+            self.connections -= 1
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def serve(self, host = '127.0.0.1', port = 0):
+        return await asyncio.start_server(self.handle, host, port)
+
+
+async def _skip_line(reader):
+    # drops a line over the limit of the reader, up to and with its end, which
+    # may not have arrived yet
+    while True:
+        try:
+            await reader.readuntil(b'\n')
+            return
+        except asyncio.LimitOverrunError as error:
+            await reader.readexactly(error.consumed)
+        except asyncio.IncompleteReadError:
+            return
+
+
+class _LocalWriter():
+
+    def __init__(self, stream: asyncio.StreamReader):
+        self.stream = stream
+
+    def write(self, data):
+        self.stream.feed_data(data)
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        self.stream.feed_eof()
+
+    async def wait_closed(self):
+        pass
+
+
+class LocalClient():
+    '''Must be made inside a running loop'''
+
+    def __init__(self, host: SessionHost):
+        self.requests = asyncio.StreamReader()
+        self.replies = asyncio.StreamReader()
+        self.task = asyncio.ensure_future(host.handle(self.requests, _LocalWriter(self.replies)))
+
+    async def send(self, line) -> dict:
+        self.requests.feed_data(line.encode('utf-8') + b'\n')
+        reply = await self.replies.readline()
+        if not reply:
+            raise ConnectionError('the host closed the session')
+        return json.loads(reply)
+
+    async def close(self):
+        self.requests.feed_eof()
+        await self.task
+
+
+async def _walk(client: LocalClient, commands, latencies):
+    # a random walk, picking up every key on the way
+    view = await client.send('look')
+    for _ in range(commands//2):
+        start = perf_counter()
+        await client.send('take')
+        latencies.append(perf_counter() - start)
+
+        exits = [e['room'] for e in view['exits'] if not e['locked']] or [view['room']]
+        start = perf_counter()
+        view = await client.send(f'go {choice(exits)}')
+        latencies.append(perf_counter() - start)
+        if 'error' in view:
+            view = await client.send('look')
+
+
+async def _benchmark(host: SessionHost, name, sessions, commands):
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    clients = [LocalClient(host) for _ in range(sessions)]
+    for client in clients:
+        await client.send(f'open {name}')
+    session_bytes = (tracemalloc.get_traced_memory()[0] - before)/sessions
+    tracemalloc.stop()
+
+    latencies = list()
+    start = perf_counter()
+    await asyncio.gather(*(_walk(c, commands, latencies) for c in clients))
+    elapsed = perf_counter() - start
+
+    for client in clients:
+        await client.close()
+    return session_bytes, len(latencies)/elapsed, latencies
+
+
+def main(argv = None):
+    from . import build_map, raw
+    from .benchmarks import percentiles
+
+    parser = ArgumentParser(prog='python -m autostory.host')
+    parser.add_argument('--sessions', type=int, default=1000)
+    parser.add_argument('--commands', type=int, default=100, help='commands per session')
+    parser.add_argument('--size', type=int, default=6, help='areas of the shared map')
+    args = parser.parse_args(argv)
+
+    reseed(0)
+    host = SessionHost({'map': build_map(raw(args.size, 5))})
+    session_bytes, rate, latencies = asyncio.run(
+            _benchmark(host, 'map', args.sessions, args.commands))
+
+    # one loop, one core
+    print(f'{args.sessions} sessions on one core, {session_bytes/1024:.1f} KiB each')
+    print(f'{rate:.0f} commands/s')
+    print('latency', '  '.join(f'p{p}={t*1e6:.1f}us' for p, t in percentiles(latencies).items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+from typing import NamedTuple, Tuple, Optional, Iterator, Union
+
+from . import datamodels
+from .map_generators import Raw
+from .text_generators import MapBuilder
+from .text_generators.generation_base_data import _PassageType, _PlaceType
+
+
+__doc__ = '''
+A `Layout` is everything about a map that is not prose: the rooms, the
+passages between them, which passages are locked and where their keys are,
+and the type chosen for every room and passage. It is computed once and
+can be rendered as many times as wanted, every render only pays for the
+text layer.
+'''
+
+
+class LayoutPassage(NamedTuple):
+    origin: str
+    destination: str
+    key_place: Optional[str]
+
+
+class Layout(NamedTuple):
+    first_ambient: str
+    ambients: Tuple[str, ...]
+    passages: Tuple[LayoutPassage, ...]
+    place_types: Tuple[_PlaceType, ...]
+    passage_types: Tuple[_PassageType, ...]
+
+    @classmethod
+    def make(cls, first_ambient, ambients, passages) -> 'Layout':
+        builder = MapBuilder()
+        context = builder.context
+
+        passage_types = tuple(
+                builder.choose_passage_type(p.key_place is not None)
+                for p in passages)
+
+        place_types = list()
+        for _ in ambients:
+            place_types.append(context.choose_place_type())
+            context.place_type_set.add(place_types[-1])
+
+        return cls(
+                first_ambient = first_ambient,
+                ambients = tuple(ambients),
+                passages = tuple(passages),
+                place_types = tuple(place_types),
+                passage_types = passage_types,
+                )
+
+    @classmethod
+    def from_raw(cls, raw_data: Raw) -> 'Layout':
+        locked_edges = {k.door: k.position.identifier for k in raw_data.keys}
+        return cls.make(
+                raw_data.initial.identifier,
+                tuple(v.identifier for v in sorted(raw_data.vertexes)),
+                tuple(LayoutPassage(
+                    e.origin.identifier,
+                    e.destin.identifier,
+                    locked_edges.get(e),
+                    ) for e in sorted(raw_data.edges)),
+                )
+
+    @classmethod
+    def from_map(cls, _map: datamodels.Map) -> 'Layout':
+        # a locked door takes its direction from its key, not from whichever
+        # of its two passages comes first
+        missing = [k.destination for k in _map.keys if k.origin is None]
+        if missing:
+            # maps from before `Key.origin` do not say which of the passages
+            # to the destination of a key is its door
+            raise ValueError(f'keys without an origin, to {", ".join(missing)}, the door they open is unknown')
+        passages = {
+                frozenset((k.origin, k.destination)): LayoutPassage(k.origin, k.destination, k.place)
+                for k in _map.keys}
+
+        for p in _map.passages:
+            pair = frozenset((p.origin, p.destination))
+            if pair not in passages:
+                passages[pair] = LayoutPassage(p.origin, p.destination, None)
+
+        return cls.make(
+                _map.first_ambient,
+                tuple(a.id for a in _map.ambients),
+                tuple(passages.values()),
+                )
+
+    def render(self) -> datamodels.Map:
+        builder = MapBuilder()
+
+        for passage, passage_type in zip(self.passages, self.passage_types):
+            builder.create_passage(
+                    passage.origin,
+                    passage.destination,
+                    passage.key_place,
+                    passage_type=passage_type)
+
+        for _id, place_type in zip(self.ambients, self.place_types):
+            builder.create_ambient(_id, place_type)
+
+        builder.first_ambient = self.first_ambient
+
+        return builder.build()
+
+
+def reskin(source: Union[Layout, Raw, datamodels.Map], count = None) -> Iterator[datamodels.Map]:
+    if isinstance(source, Raw):
+        source = Layout.from_raw(source)
+    elif isinstance(source, datamodels.Map):
+        source = Layout.from_map(source)
+
+    rendered = 0
+    while count is None or rendered < count:
+        yield source.render()
+        rendered += 1
@@ -1,5 +1,13 @@
-from typing import NamedTuple
-from random import choice, randint, shuffle
+from typing import NamedTuple, List, Tuple
+from random import choice, randint, randrange, shuffle, getstate, setstate, seed as reseed
+from functools import partial
+from contextlib import contextmanager
+from hashlib import blake2b
+from threading import RLock
+
+import os
+
+from . import tracing
 
 
 __doc___ = '''
@@ -43,53 +51,205 @@ class Key(NamedTuple):
     door: 'Edge'
 
 
-def raw(size = 3, size_factor = 4) -> Raw:
-    if not size or size < 3:
-        size = 3
-    if not size_factor or size_factor < 4:
-        size_factor = 4
+def derive_seed(seed, *parts) -> int:
+    # stable across processes, unlike hash() on strings
+    digest = blake2b(repr((seed, *parts)).encode(), digest_size=8)
+    return int.from_bytes(digest.digest(), 'big')
+
+
+_SEEDED = RLock()
+
+
+def _reset_seeded_lock():
+    # a pool forked while another thread was seeding must not inherit it held
+    global _SEEDED
+    _SEEDED = RLock()
+
+
+if hasattr(os, 'register_at_fork'):
+    # posix only, windows starts pools with spawn and never forks
+    os.register_at_fork(after_in_child=_reset_seeded_lock)
+
+
+@contextmanager
+def seeded(seed):
+    '''
+    Draws from the global random state seeded with `seed`, the state of the
+    caller is given back on exit. Seeded sections of different threads run
+    one at a time, a thread drawing outside of one can still shift it.
+    '''
+    with _SEEDED:
+        state = getstate()
+        reseed(seed)
+        try:
+            yield
+        finally:
+            setstate(state)
 
-    vertexes = [Vertex(0, 0)]
+
+def _area_size(size_factor) -> int:
+    minimum_sub_size = size_factor//2+1
+    maximum_sub_size = size_factor*2-1
+    return randint(minimum_sub_size, maximum_sub_size)
+
+
+def _area_edges(area_id, sub_size) -> List[Edge]:
+    # the vertexes of an area are numbered, so choosing among the ones
+    # already made is choosing a number below the new one
+    edges = []
+    for sub_area_id in range(1, sub_size):
+        new_vertex = Vertex(area_id, sub_area_id)
+        minimum_connection = 1
+        maximum_connection = min(sub_area_id, 3)
+        connection_amount = randint(minimum_connection, maximum_connection)
+        for connection_id in range(connection_amount):
+            edges.append(Edge(new_vertex, Vertex(area_id, randrange(sub_area_id))))
+    return edges
+
+
+def _link_areas(sizes) -> Tuple[List[Edge], List[Key]]:
+    size = len(sizes)
     edges = []
     keys = []
 
-    for area_id in range(1, size):
-        vertexes.append(Vertex(area_id, 0))
-        minimum_sub_size = size_factor//2+1
-        maximum_sub_size = size_factor*2-1
-        sub_size = randint(minimum_sub_size, maximum_sub_size)
-        for sub_area_id in range(1, sub_size):
-            new_vertex = Vertex(area_id, sub_area_id)
-            minimum_connection = 1
-            maximum_connection = min(sub_area_id, 3)
-            connection_amount = randint(minimum_connection, maximum_connection)
-            for connection_id in range(connection_amount):
-                edges.append(Edge(
-                    new_vertex,
-                    choice(tuple(v for v in vertexes if v.area == area_id))
-                    ))
-            vertexes.append(new_vertex)
-
     for area_id in range(0, size-1):
         previous = [area_id + 1, randint(min(area_id+1, size-1), size-1)]
         shuffle(previous)
         key_area, door_area = previous
 
         new_edge = Edge(
-                choice(tuple(v for v in vertexes if v.area == door_area)),
-                choice(tuple(v for v in vertexes if v.area == area_id)),
+                Vertex(door_area, randrange(sizes[door_area])),
+                Vertex(area_id, randrange(sizes[area_id])),
                 )
         new_key = Key(
-                choice(tuple(v for v in vertexes if v.area == key_area and v not in new_edge)),
+                choice(tuple(v for v in map(partial(Vertex, key_area), range(sizes[key_area])) if v not in new_edge)),
                 new_edge,
                 )
         edges.append(new_edge)
         keys.append(new_key)
 
+    return edges, keys
+
 
+def _assemble(sizes, edges, keys) -> Raw:
+    vertexes = [Vertex(area_id, sub_area_id) for area_id, sub_size in enumerate(sizes) for sub_area_id in range(sub_size)]
     return Raw(
         vertexes = set(vertexes),
         edges = set(edges),
         keys = set(keys),
         initial = vertexes[-1],
-        final = vertexes[0]) 
+        final = vertexes[0])
+
+
+def raw(size = 3, size_factor = 4) -> Raw:
+    if not size or size < 3:
+        size = 3
+    if not size_factor or size_factor < 4:
+        size_factor = 4
+
+    with tracing.span('raw', size=size, size_factor=size_factor) as span:
+        sizes = [1]
+        edges = []
+
+        for area_id in range(1, size):
+            sizes.append(_area_size(size_factor))
+            edges.extend(_area_edges(area_id, sizes[-1]))
+
+        link_edges, keys = _link_areas(sizes)
+
+        span.set(vertexes=sum(sizes), edges=len(edges) + len(link_edges))
+        return _assemble(sizes, edges + link_edges, keys)
+
+
+_PLAIN_LINK = 0
+_DOOR_LINK = 1
+_KEY_LINK = 2
+_LINKS = 3
+
+# every round is a pass over every node; random maps of any size stop
+# splitting after six or seven, the rare ones still splitting after eight
+# only lose the detail of links further than eight away
+_ROUNDS = 8
+
+
+def fingerprint(raw_data: Raw) -> str:
+    '''
+    Structural hash of a `Raw`, invariant to how vertexes are numbered. Every
+    locked edge is replaced by a door node linked to both of its ends and to
+    the position of its key, then the colors are refined Weisfeiler-Lehman
+    style until the partition stops splitting, for at most `_ROUNDS` rounds.
+    Isomorphic maps always share a fingerprint, but it is not canonical:
+    some maps that are not isomorphic share one too, `unique_raws` then
+    rerolls a map it did not have to.
+    '''
+    doors = {k.door: k for k in raw_data.keys}
+    nodes = list(raw_data.vertexes) + list(doors)
+    index = {node: i for i, node in enumerate(nodes)}
+    # a neighbour and its link packed in one int
+    adjacency = [[] for _ in nodes]
+
+    def link(a, b, label):
+        a, b = index[a], index[b]
+        adjacency[a].append(b*_LINKS + label)
+        adjacency[b].append(a*_LINKS + label)
+
+    for edge in raw_data.edges:
+        if edge not in doors:
+            link(edge.origin, edge.destin, _PLAIN_LINK)
+    for door, key in doors.items():
+        link(door.origin, door, _DOOR_LINK)
+        link(door.destin, door, _DOOR_LINK)
+        link(key.position, door, _KEY_LINK)
+
+    colors = [(
+        isinstance(node, Edge),
+        node == raw_data.initial,
+        node == raw_data.final,
+        ) for node in nodes]
+
+    digest = blake2b(digest_size=16)
+    classes = 0
+    for rounds in range(1, _ROUNDS + 1):
+        palette = sorted(set(colors))
+        rank = {color: i for i, color in enumerate(palette)}
+        colors = [rank[color] for color in colors]
+
+        histogram = [0]*len(palette)
+        for color in colors:
+            histogram[color] += 1
+        digest.update(repr((palette, histogram)).encode())
+
+        if len(palette) == classes or rounds == _ROUNDS:
+            break
+        classes = len(palette)
+
+        # flat tuples of ints, the color of a node then the ones of its
+        # links, whatever the round
+        colors = [
+            (colors[i], *sorted([colors[n//_LINKS]*_LINKS + n%_LINKS for n in adjacency[i]]))
+            for i in range(len(nodes))]
+    return digest.hexdigest()
+
+
+def unique_raws(count, size = 3, size_factor = 4, max_rerolls = 100, seen = None, sample = None):
+    '''
+    Yields `count` raw maps that are pairwise non isomorphic, re-rolling
+    duplicates before anything downstream pays for them. `seen` may carry
+    fingerprints from previous batches and is updated in place, `sample`
+    replaces the call to `raw`.
+    '''
+    seen = set() if seen is None else seen
+    if sample is None:
+        sample = lambda: raw(size, size_factor)
+    for _ in range(count):
+        for _ in range(max_rerolls + 1):
+            raw_data = sample()
+            key = fingerprint(raw_data)
+            if key not in seen:
+                break
+        else:
+            raise ValueError(
+                    f'no new layout after {max_rerolls} rerolls, '
+                    f'size={size} size_factor={size_factor} looks exhausted')
+        seen.add(key)
+        yield raw_data
@@ -0,0 +1,171 @@
+from random import choice
+from collections import defaultdict
+from itertools import chain
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple, Tuple
+from os import cpu_count
+
+from . import datamodels
+from .map_generators import Raw, Edge, Key, derive_seed, seeded
+from .map_generators import _area_size, _area_edges, _link_areas, _assemble
+from .text_generators import MapBuilder
+from .text_generators.generation_base_data import _PassageType, _Flavor
+
+
+__doc__ = '''
+Renders the text of a single map in several processes.
+
+Ambients are partitioned by area. Every partition is rendered by its own
+`MapBuilder`, so it has its own norepeat scope, and its random state is
+derived only from the seed and the area id: the result does not depend on
+the number of workers or on the order they finish. The random state of the
+caller is left as it was.
+
+Passages between areas are rendered by both partitions they touch, the
+passage type and flavor of those doors are drawn up front so both sides
+match.
+
+The graph itself can be sharded the same way: every area subgraph is made
+by a worker, only the sizes of the areas and the locked edges linking them
+are drawn by the main process, so a world keeps the invariants of `raw`.
+'''
+
+
+class _Door(NamedTuple):
+    edge: Edge
+    key: Key
+    passage_type: _PassageType
+    flavor: _Flavor
+
+
+class _AreaPayload(NamedTuple):
+    seed: int
+    area: int
+    vertexes: Tuple[str, ...]
+    edges: Tuple[Edge, ...]
+    doors: Tuple[_Door, ...]
+
+
+def _render_area(payload: _AreaPayload):
+    with seeded(derive_seed(payload.seed, 'area', payload.area)):
+        return _render_area_parts(payload)
+
+
+def _render_area_parts(payload: _AreaPayload):
+    builder = MapBuilder()
+
+    for edge in payload.edges:
+        builder.create_passage(edge.origin.identifier, edge.destin.identifier, None)
+
+    for door in payload.doors:
+        builder.create_passage(
+                door.edge.origin.identifier,
+                door.edge.destin.identifier,
+                door.key,
+                passage_type = door.passage_type,
+                flavor = door.flavor,
+                )
+
+    for _id in payload.vertexes:
+        builder.create_ambient(_id)
+
+    ambients, passages, keys = builder.build_parts()
+    # doors are rendered by both sides, each partition keeps what starts in it
+    own = set(payload.vertexes)
+    return (
+            ambients,
+            tuple(p for p in passages if p.origin in own),
+            tuple(k for k in keys if k.destination in own),
+            )
+
+
+def _partition(raw_data: Raw, seed, doors) -> Tuple[_AreaPayload, ...]:
+    vertexes = defaultdict(list)
+    edges = defaultdict(list)
+    area_doors = defaultdict(list)
+
+    for vertex in sorted(raw_data.vertexes):
+        vertexes[vertex.area].append(vertex.identifier)
+
+    for edge in sorted(raw_data.edges):
+        if edge in doors:
+            area_doors[edge.origin.area].append(doors[edge])
+            area_doors[edge.destin.area].append(doors[edge])
+        else:
+            edges[edge.origin.area].append(edge)
+
+    return tuple(_AreaPayload(
+                seed = seed,
+                area = area,
+                vertexes = tuple(vertexes[area]),
+                edges = tuple(edges[area]),
+                doors = tuple(area_doors[area]),
+                ) for area in sorted(vertexes))
+
+
+def _fan_out(function, payloads, workers = None, pool = None) -> tuple:
+    workers = workers or cpu_count() or 1
+    if workers == 1:
+        return tuple(map(function, payloads))
+
+    chunksize = max(1, len(payloads)//(4*workers))
+    if pool is not None:
+        return tuple(pool.map(function, payloads, chunksize=chunksize))
+    with ProcessPoolExecutor(max_workers=min(workers, len(payloads))) as pool:
+        return tuple(pool.map(function, payloads, chunksize=chunksize))
+
+
+def render_parallel(raw_data: Raw, seed, workers = None, pool = None) -> datamodels.Map:
+    with seeded(derive_seed(seed, 'map')):
+        builder = MapBuilder()
+
+        doors = dict()
+        for key in sorted(raw_data.keys):
+            passage_type = builder.choose_passage_type(locked=True)
+            doors[key.door] = _Door(key.door, key, passage_type, choice(passage_type.flavor_list))
+
+    payloads = _partition(raw_data, seed, doors)
+    parts = _fan_out(_render_area, payloads, workers, pool)
+
+    builder.first_ambient = raw_data.initial.identifier
+    with seeded(derive_seed(seed, 'header')):
+        header = builder.build()
+    return header._replace(
+            ambients = tuple(a for ambients, _, _ in parts for a in ambients),
+            passages = tuple(p for _, passages, _ in parts for p in passages),
+            keys = tuple(k for _, _, keys in parts for k in keys),
+            )
+
+
+def _area_graph(payload) -> Tuple[Edge, ...]:
+    seed, area_id, sub_size = payload
+    with seeded(derive_seed(seed, 'graph', area_id)):
+        return tuple(_area_edges(area_id, sub_size))
+
+
+def sharded_raw(size, size_factor, seed, workers = None, pool = None) -> Raw:
+    if not size or size < 3:
+        size = 3
+    if not size_factor or size_factor < 4:
+        size_factor = 4
+
+    with seeded(derive_seed(seed, 'sizes')):
+        sizes = [1] + [_area_size(size_factor) for _ in range(1, size)]
+
+    payloads = tuple((seed, area_id, sizes[area_id]) for area_id in range(1, size))
+    edges = list(chain.from_iterable(_fan_out(_area_graph, payloads, workers, pool)))
+
+    with seeded(derive_seed(seed, 'links')):
+        link_edges, keys = _link_areas(sizes)
+
+    return _assemble(sizes, edges + link_edges, keys)
+
+
+def generate_world(size, size_factor, seed, workers = None) -> datamodels.Map:
+    workers = workers or cpu_count() or 1
+    if workers == 1:
+        return render_parallel(sharded_raw(size, size_factor, seed, 1), seed, 1)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        raw_data = sharded_raw(size, size_factor, seed, workers, pool)
+        return render_parallel(raw_data, seed, workers, pool)
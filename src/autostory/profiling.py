@@ -0,0 +1,186 @@
+from contextlib import contextmanager
+from collections import Counter
+from functools import wraps
+from threading import Lock, local
+from pathlib import Path
+from tempfile import gettempdir
+
+import cProfile
+import os
+import sys
+import tracemalloc
+
+
+__doc__ = '''
+Opt-in profiling of generation runs, without touching the code.
+
+    AUTOSTORY_PROFILE=cpu,memory   what to record, `cpu` (cProfile), `memory`
+                                   (tracemalloc) or both
+    AUTOSTORY_PROFILE_DIR=path     where the files go, a temporary directory
+                                   by default
+    AUTOSTORY_PROFILE_EVERY=n      only profile every n-th run of each stage
+
+`enable` and `disable` do the same from code. Every profiled run writes
+`<stage>-<pid>-<run>.prof`, readable with `pstats` or snakeviz, and
+`<stage>-<pid>-<run>.memory.txt` with the peak and the top allocation sites
+of the memory still held when the run ends.
+
+A run started inside another one, a `MapBuilder.build` called by
+`generate_json`, is part of the outer profile and is not counted on its own.
+Runs of different threads are profiled each on its own, but tracemalloc is
+process wide: their memory files share its peak and its snapshots. A profile
+that can not be written is reported on stderr, the run itself goes on.
+'''
+
+
+# tracemalloc is process wide, so the memory runs of every profiler share it:
+# the first one starts it, unless it was already on, the last one stops it
+_TRACING = Lock()
+_traced_runs = 0
+_started_tracing = False
+
+
+def _start_tracing():
+    global _traced_runs, _started_tracing
+    with _TRACING:
+        if _traced_runs == 0:
+            _started_tracing = not tracemalloc.is_tracing()
+            if _started_tracing:
+                tracemalloc.start()
+        _traced_runs += 1
+
+
+def _stop_tracing():
+    global _traced_runs, _started_tracing
+    with _TRACING:
+        _traced_runs -= 1
+        if _traced_runs == 0 and _started_tracing:
+            tracemalloc.stop()
+            _started_tracing = False
+
+
+class Profiler():
+
+    def __init__(self, cpu = True, memory = False, directory = None, every = 1, top = 25):
+        if not cpu and not memory:
+            raise ValueError('nothing to profile, enable cpu or memory')
+        self.cpu = cpu
+        self.memory = memory
+        self.directory = Path(directory or Path(gettempdir())/'autostory-profiles')
+        self.every = max(1, int(every))
+        self.top = top
+        self.runs = Counter()
+        self.__lock = Lock()
+        self.__active = local()
+
+    @classmethod
+    def from_environment(cls, environ = os.environ) -> 'Profiler':
+        kinds = {k.strip() for k in environ.get('AUTOSTORY_PROFILE', '').lower().split(',')} - {''}
+        if not kinds or kinds <= {'0', 'false', 'no'}:
+            return None
+        if kinds & {'1', 'true', 'yes', 'all'}:
+            kinds = {'cpu', 'memory'}
+        return cls(
+                cpu = 'cpu' in kinds,
+                memory = 'memory' in kinds,
+                directory = environ.get('AUTOSTORY_PROFILE_DIR'),
+                every = environ.get('AUTOSTORY_PROFILE_EVERY', 1),
+                )
+
+    def _take(self, stage):
+        # the run number, if this one is to be profiled
+        with self.__lock:
+            self.runs[stage] += 1
+            run = self.runs[stage]
+        return run if run % self.every == 0 else None
+
+    @contextmanager
+    def run(self, stage):
+        if getattr(self.__active, 'stage', None) is not None:
+            yield
+            return
+
+        self.__active.stage = stage
+        try:
+            run = self._take(stage)
+            if run is None:
+                yield
+            else:
+                with self._profile(self.directory/f'{stage}-{os.getpid()}-{run}'):
+                    yield
+        finally:
+            self.__active.stage = None
+
+    @contextmanager
+    def _profile(self, prefix):
+        profile = cProfile.Profile() if self.cpu else None
+        if self.memory:
+            _start_tracing()
+            if hasattr(tracemalloc, 'reset_peak'):
+                # python 3.8 has no reset_peak, the peak then covers the time
+                # tracing was on before this run too
+                tracemalloc.reset_peak()
+        try:
+            try:
+                if profile is not None:
+                    profile.enable()
+            except ValueError:
+                # another profiler already runs, python 3.12 allows only one
+                profile = None
+            try:
+                yield
+            finally:
+                if profile is not None:
+                    profile.disable()
+            try:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                if profile is not None:
+                    profile.dump_stats(f'{prefix}.prof')
+                if self.memory:
+                    self._dump_memory(f'{prefix}.memory.txt')
+            except Exception as error:
+                print(f'profile {prefix} not written: {error!r}', file=sys.stderr)
+        finally:
+            if self.memory:
+                _stop_tracing()
+
+    def _dump_memory(self, path):
+        if not tracemalloc.is_tracing():
+            # stopped by code outside of the profiler
+            return
+        _, peak = tracemalloc.get_traced_memory()
+        statistics = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__),
+                )).statistics('lineno')
+        with open(path, 'w') as file:
+            file.write(f'peak: {peak/1024:.1f} KiB\n')
+            for stat in statistics[:self.top]:
+                file.write(f'{stat}\n')
+
+
+_PROFILER = Profiler.from_environment()
+
+
+def enable(profiler = None, **kwargs) -> Profiler:
+    global _PROFILER
+    _PROFILER = profiler or Profiler(**kwargs)
+    return _PROFILER
+
+
+def disable():
+    global _PROFILER
+    _PROFILER = None
+
+
+def profiled(stage):
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            # only a global lookup when profiling is off
+            if _PROFILER is None:
+                return function(*args, **kwargs)
+            with _PROFILER.run(stage):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,112 @@
+from typing import NamedTuple, Dict, Tuple, Set
+from hashlib import blake2b
+
+import json
+
+from . import datamodels
+
+
+__doc__ = '''
+Plays a `datamodels.Map`. A `World` indexes the map once, rooms by id,
+passages by the room they leave and keys by the door they open and by the
+room they lie in, every `Session` over it is then only a position, the keys
+picked up and the doors opened, so a world can host many sessions at once.
+
+A key opens the door between its `origin` and its `destination`, from both
+sides. Keys of maps without origins open every passage to their destination.
+'''
+
+
+class Locked(ValueError):
+    pass
+
+
+class View(NamedTuple):
+    ambient: datamodels.Ambient
+    exits: Tuple[datamodels.Passage, ...]
+    keys: Tuple[datamodels.Key, ...]
+
+
+class World():
+
+    def __init__(self, _map: datamodels.Map):
+        self.map = _map
+        self.ambients: Dict[str, datamodels.Ambient] = {a.id: a for a in _map.ambients}
+
+        exits = dict()
+        entrances = dict()
+        for passage in _map.passages:
+            exits.setdefault(passage.origin, dict())[passage.destination] = passage
+            entrances.setdefault(passage.destination, list()).append(passage.origin)
+        self.exits: Dict[str, Dict[str, datamodels.Passage]] = exits
+
+        self.doors: Dict[Tuple[str, str], datamodels.Key] = dict()
+        keys_at = dict()
+        for key in _map.keys:
+            if key.origin is None:
+                for origin in entrances.get(key.destination, ()):
+                    self.doors[(origin, key.destination)] = key
+            else:
+                self.doors[(key.origin, key.destination)] = key
+                self.doors[(key.destination, key.origin)] = key
+            keys_at[key.place] = keys_at.get(key.place, tuple()) + (key,)
+        self.keys_at: Dict[str, Tuple[datamodels.Key, ...]] = keys_at
+
+        # positions in the map tuples, what save states refer to
+        self.ambient_order: Dict[str, int] = {a.id: i for i, a in enumerate(_map.ambients)}
+        self.key_order: Dict[datamodels.Key, int] = {k: i for i, k in enumerate(_map.keys)}
+        self.__digest = None
+
+    @property
+    def digest(self) -> bytes:
+        '''Content hash of the map'''
+        if self.__digest is None:
+            text = json.dumps(self.map.as_dict(), ensure_ascii=False, separators=(',', ':'))
+            self.__digest = blake2b(text.encode('utf-8'), digest_size=16).digest()
+        return self.__digest
+
+    def session(self, start = None) -> 'Session':
+        return Session(self, start)
+
+
+class Session():
+    __slots__ = ('world', 'position', 'held', 'opened')
+
+    def __init__(self, world: World, start = None):
+        self.world = world
+        self.position = start or world.map.first_ambient
+        if self.position not in world.ambients:
+            raise KeyError(self.position)
+        self.held: Set[datamodels.Key] = set()
+        self.opened: Set[datamodels.Key] = set()  # keys whose door was crossed
+
+    @property
+    def ambient(self) -> datamodels.Ambient:
+        return self.world.ambients[self.position]
+
+    def is_locked(self, destination) -> bool:
+        key = self.world.doors.get((self.position, destination))
+        return key is not None and key not in self.held
+
+    def look(self) -> View:
+        return View(
+                self.ambient,
+                tuple(self.world.exits.get(self.position, dict()).values()),
+                tuple(k for k in self.world.keys_at.get(self.position, ()) if k not in self.held),
+                )
+
+    def move(self, destination) -> datamodels.Ambient:
+        if destination not in self.world.exits.get(self.position, ()):
+            raise ValueError(f'there is no passage from {self.position} to {destination}')
+        key = self.world.doors.get((self.position, destination))
+        if key is not None:
+            if key not in self.held:
+                raise Locked(f'the passage from {self.position} to {destination} is locked')
+            self.opened.add(key)
+        self.position = destination
+        return self.ambient
+
+    def pick_up(self) -> Tuple[datamodels.Key, ...]:
+        found = tuple(k for k in self.world.keys_at.get(self.position, ()) if k not in self.held)
+        self.held.update(found)
+        return found
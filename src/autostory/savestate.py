@@ -0,0 +1,95 @@
+from typing import Tuple
+
+from .runtime import World, Session
+
+
+__doc__ = '''
+Save states of play sessions, a few tens of bytes each.
+
+    magic  version  map digest  position  keys held  doors opened
+    b'AS'  1 byte   16 bytes    varint    bitset     bitset
+
+The map is only referred to by its content hash, `World.digest`, a state is
+loaded over the world of the same map. The position is the index of the
+room in `Map.ambients`, the bitsets have one bit per entry of `Map.keys`,
+the door of a key being the passage between its origin and destination,
+little endian and as long as the map needs.
+'''
+
+
+MAGIC = b'AS'
+VERSION = 1
+
+
+def _varint(value) -> bytes:
+    data = bytearray()
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if value:
+            data.append(byte | 0x80)
+        else:
+            data.append(byte)
+            return bytes(data)
+
+
+def _read_varint(data, offset) -> Tuple[int, int]:
+    value = 0
+    shift = 0
+    while True:
+        if offset >= len(data):
+            raise ValueError('truncated save state')
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, offset
+
+
+def _bitset(world: World, keys) -> bytes:
+    bits = 0
+    for key in keys:
+        bits |= 1 << world.key_order[key]
+    return bits.to_bytes((len(world.map.keys) + 7)//8, 'little')
+
+
+def _keys(world: World, data) -> set:
+    bits = int.from_bytes(data, 'little')
+    if bits >> len(world.map.keys):
+        raise ValueError('the save state has keys the map does not')
+    return {k for k, i in world.key_order.items() if bits >> i & 1}
+
+
+def save(session: Session) -> bytes:
+    world = session.world
+    return b''.join((
+            MAGIC,
+            bytes((VERSION,)),
+            world.digest,
+            _varint(world.ambient_order[session.position]),
+            _bitset(world, session.held),
+            _bitset(world, session.opened),
+            ))
+
+
+def load(world: World, data: bytes) -> Session:
+    if data[:2] != MAGIC:
+        raise ValueError('not a save state')
+    if data[2:3] != bytes((VERSION,)):
+        raise ValueError(f'unknown save state version {data[2:3].hex()}')
+    digest = world.digest
+    if data[3:3 + len(digest)] != digest:
+        raise ValueError('the save state is of another map')
+
+    position, offset = _read_varint(data, 3 + len(digest))
+    if position >= len(world.map.ambients):
+        raise ValueError('the save state has a room the map does not')
+    size = (len(world.map.keys) + 7)//8
+    if len(data) != offset + 2*size:
+        raise ValueError('the save state does not fit the map')
+
+    session = Session(world, world.map.ambients[position].id)
+    session.held = _keys(world, data[offset:offset + size])
+    session.opened = _keys(world, data[offset + size:])
+    return session
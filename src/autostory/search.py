@@ -0,0 +1,174 @@
+from typing import NamedTuple, Iterable, List, Tuple
+from collections import Counter
+
+import re
+import sqlite3
+
+from . import datamodels
+
+
+__doc__ = '''
+Inverted index of the text of generated maps, kept in sqlite, for finding
+phrases and words used together across a whole corpus.
+
+Every room is a document: its description, then the descriptions of its
+decorations and passages. A posting is (token, document, position), stored
+clustered by token. A query scans the postings of its rarest token and
+checks the others with primary key lookups, so it costs what that token
+costs, not the size of the corpus.
+The parts of a room are indexed with a gap between them, a phrase never
+matches across two of them.
+
+    index = DescriptionIndex('corpus.sqlite')
+    index.add('seed-42', _map)
+    index.phrase('muito velho')
+    index.together('sangue', 'mofo')
+'''
+
+
+_TOKEN = re.compile(r'\w+')
+
+
+def tokenize(text) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+
+class Hit(NamedTuple):
+    map: str
+    ambient: str
+
+
+class DescriptionIndex():
+
+    def __init__(self, path = ':memory:'):
+        self.connection = sqlite3.connect(str(path))
+        self.connection.executescript('''
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS maps (
+                id INTEGER PRIMARY KEY,
+                name TEXT UNIQUE NOT NULL);
+            CREATE TABLE IF NOT EXISTS documents (
+                id INTEGER PRIMARY KEY,
+                map INTEGER NOT NULL REFERENCES maps(id),
+                ambient TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS tokens (
+                id INTEGER PRIMARY KEY,
+                token TEXT UNIQUE NOT NULL,
+                postings INTEGER NOT NULL DEFAULT 0);
+            CREATE TABLE IF NOT EXISTS postings (
+                token INTEGER NOT NULL,
+                document INTEGER NOT NULL,
+                position INTEGER NOT NULL,
+                PRIMARY KEY (token, document, position)) WITHOUT ROWID;
+            ''')
+        self.tokens = dict(self.connection.execute('SELECT token, id FROM tokens'))
+
+    def close(self):
+        self.connection.close()
+
+    def __contains__(self, name) -> bool:
+        return self.connection.execute('SELECT 1 FROM maps WHERE name = ?', (name,)).fetchone() is not None
+
+    def _token_id(self, token) -> int:
+        if token not in self.tokens:
+            cursor = self.connection.execute('INSERT INTO tokens (token) VALUES (?)', (token,))
+            self.tokens[token] = cursor.lastrowid
+        return self.tokens[token]
+
+    def add(self, name, _map: datamodels.Map) -> bool:
+        '''Indexes `_map` under `name`, False if the name was already indexed'''
+        if name in self:
+            return False
+        try:
+            with self.connection:
+                map_id = self.connection.execute('INSERT INTO maps (name) VALUES (?)', (name,)).lastrowid
+                postings = list()
+                for ambient in _map.ambients:
+                    document = self.connection.execute(
+                            'INSERT INTO documents (map, ambient) VALUES (?, ?)',
+                            (map_id, ambient.id)).lastrowid
+                    postings.extend(self._postings(document, ambient))
+                # in index order, every insert lands next to the previous one
+                postings.sort()
+                self.connection.executemany(
+                        'INSERT INTO postings (token, document, position) VALUES (?, ?, ?)',
+                        postings)
+                self.connection.executemany(
+                        'UPDATE tokens SET postings = postings + ? WHERE id = ?',
+                        ((count, token) for token, count in Counter(p[0] for p in postings).items()))
+        except BaseException:
+            # the tokens added by the rolled back transaction are gone
+            self.tokens = dict(self.connection.execute('SELECT token, id FROM tokens'))
+            raise
+        return True
+
+    def add_many(self, maps: Iterable[Tuple[str, datamodels.Map]]) -> int:
+        return sum(self.add(name, _map) for name, _map in maps)
+
+    def _postings(self, document, ambient: datamodels.Ambient):
+        position = 0
+        for text in (ambient.descritption, *ambient.decorations, *ambient.passages):
+            for token in tokenize(text):
+                yield self._token_id(token), document, position
+                position += 1
+            position += 1
+
+    def _hits(self, query, parameters) -> List[Hit]:
+        return [Hit(*row) for row in self.connection.execute(f'''
+                SELECT maps.name, documents.ambient
+                FROM ({query}) AS found
+                JOIN documents ON documents.id = found.document
+                JOIN maps ON maps.id = documents.map
+                ORDER BY documents.id''', parameters)]
+
+    def _rarest(self, tokens) -> int:
+        # queries scan the postings of their rarest token and only look the
+        # others up, by their primary key
+        ids = tuple(self.tokens[t] for t in tokens)
+        counts = dict(self.connection.execute(
+                f'SELECT id, postings FROM tokens WHERE id IN ({", ".join("?"*len(ids))})', ids))
+        return min(range(len(ids)), key=lambda i: counts[ids[i]])
+
+    def phrase(self, text) -> List[Hit]:
+        '''Rooms where the tokens of `text` show up next to each other, in order'''
+        tokens = tokenize(text)
+        if not tokens or any(t not in self.tokens for t in tokens):
+            return list()
+
+        anchor = self._rarest(tokens)
+        others = [i for i in range(len(tokens)) if i != anchor]
+        conditions = ''.join(
+                f' AND EXISTS (SELECT 1 FROM postings WHERE token = ? AND document = anchor.document'
+                f' AND position = anchor.position + {i - anchor})'
+                for i in others)
+        query = f'SELECT DISTINCT document FROM postings AS anchor WHERE token = ?{conditions}'
+        return self._hits(query, [self.tokens[tokens[i]] for i in [anchor] + others])
+
+    def together(self, *words) -> List[Hit]:
+        '''Rooms where every one of `words` shows up, anywhere'''
+        tokens = [t for w in words for t in tokenize(w)]
+        if not tokens or any(t not in self.tokens for t in tokens):
+            return list()
+
+        anchor = self._rarest(tokens)
+        others = [i for i in range(len(tokens)) if i != anchor]
+        conditions = ''.join(
+                ' AND EXISTS (SELECT 1 FROM postings WHERE token = ? AND document = anchor.document)'
+                for _ in others)
+        query = f'SELECT DISTINCT document FROM postings AS anchor WHERE token = ?{conditions}'
+        return self._hits(query, [self.tokens[tokens[i]] for i in [anchor] + others])
+
+    def cooccurrences(self, word, limit = 20) -> List[Tuple[str, int]]:
+        '''Tokens found in the most rooms together with `word`'''
+        if word.lower() not in self.tokens:
+            return list()
+        return list(self.connection.execute('''
+                SELECT tokens.token, COUNT(DISTINCT other.document) AS rooms
+                FROM postings AS own
+                JOIN postings AS other ON other.document = own.document AND other.token != own.token
+                JOIN tokens ON tokens.id = other.token
+                WHERE own.token = ?
+                GROUP BY other.token
+                ORDER BY rooms DESC, tokens.token
+                LIMIT ?''', (self.tokens[word.lower()], limit)))
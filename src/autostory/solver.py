@@ -0,0 +1,307 @@
+from typing import NamedTuple, Tuple
+from collections import defaultdict, deque
+from heapq import heappush, heappop
+
+from .map_generators import Raw, Vertex, Key
+
+
+__doc__ = '''
+Finds the shortest walkthrough of a raw map: the route from `Raw.initial` to
+`Raw.final`, picking up every key found on the way and crossing a locked
+edge only while holding its key.
+
+`raw` links every area `i` to a bigger area through a locked edge whose key
+lies in a bigger area too, one of those two areas being `i + 1`. So area `i`
+can only be entered once `i + 1` was, and the order in which the areas are
+first entered is fixed, from the initial area, the biggest, down to area 0.
+A walkthrough is a sequence of legs, leg `t` going from the room where the
+`t`th area was entered to the room of the next one, through areas already
+opened, so the only choice left is which keys each leg picks up.
+
+The search is A* over (room, leg, keys held) states moving from one pickup to
+the next, the keys held being an int bitset. The areas are a tree, so what
+a leg costs is the sum of what it costs in every area: the walk across the
+areas on its way, and a door in and out of any other area it goes into. The
+estimate drops only the areas a leg crosses to reach one of those, so the
+keys of every area are assigned to legs on their own, by a small DP over the
+legs in which they can be picked up, and the estimate is the sum of those and
+of the remaining legs. It is most often exact, the search goes straight down.
+'''
+
+
+class Solution(NamedTuple):
+    route: Tuple[Vertex, ...]
+    keys: Tuple[Key, ...]
+    backtracking: int
+
+
+class _Item(NamedTuple):
+    key: Key
+    first: int  # the leg that enters its area
+    last: int   # the leg that ends at its door
+
+
+def _bfs(source, adjacency) -> Tuple[dict, dict]:
+    distance = {source: 0}
+    previous = {source: None}
+    queue = deque([source])
+    while queue:
+        vertex = queue.popleft()
+        for other in adjacency[vertex]:
+            if other not in distance:
+                distance[other] = distance[vertex] + 1
+                previous[other] = vertex
+                queue.append(other)
+    return distance, previous
+
+
+def _subsets(mask):
+    subset = mask
+    while True:
+        yield subset
+        if not subset:
+            return
+        subset = (subset - 1) & mask
+
+
+def _area_tree(raw_data: Raw, doors) -> tuple:
+    key_of = dict()
+    entry = dict()
+    side = dict()  # (area, neighbour area): the room of area at their door
+    parent = dict()
+    for door, key in doors.items():
+        upper, lower = sorted(door, key=lambda v: v.area, reverse=True)
+        key_of[lower.area] = key
+        entry[lower.area] = lower
+        parent[lower.area] = upper.area
+        side[(lower.area, upper.area)] = lower
+        side[(upper.area, lower.area)] = upper
+
+    order = sorted({v.area for v in raw_data.vertexes}, reverse=True)
+    if order[0] != raw_data.initial.area or set(key_of) != set(order[1:]):
+        raise ValueError('the map was not made by raw')
+    for previous, area in zip(order, order[1:]):
+        if previous not in (parent[area], key_of[area].position.area):
+            raise ValueError('the map was not made by raw')
+    return order, key_of, entry, side
+
+
+def solve(raw_data: Raw) -> Solution:
+    doors = {k.door: k for k in raw_data.keys}
+    order, key_of, entry, side = _area_tree(raw_data, doors)
+    leg_of = {area: t for t, area in enumerate(order)}
+
+    adjacency = defaultdict(list)
+    for edge in raw_data.edges:
+        adjacency[edge.origin].append(edge.destin)
+        adjacency[edge.destin].append(edge.origin)
+
+    # shortest paths ignoring locks are never wrong: the opened areas are a
+    # subtree, and leaving it means coming back through the same door
+    searches = dict()
+
+    def distance(a, b) -> int:
+        if b not in searches:
+            searches[b] = _bfs(b, adjacency)
+        return searches[b][0][a]
+
+    # the next area and the distance from every area to every other one
+    neighbours = defaultdict(list)
+    for a, b in side:
+        neighbours[a].append(b)
+    hops = dict()
+    for area in order:
+        hop = {area: (None, 0)}
+        queue = deque([area])
+        while queue:
+            current = queue.popleft()
+            for other in neighbours[current]:
+                if other not in hop:
+                    hop[other] = (other if current == area else hop[current][0], hop[current][1] + 1)
+                    queue.append(other)
+        hops[area] = hop
+
+    targets = [raw_data.initial] + [entry[area] for area in order[1:]]
+    if targets[-1] != raw_data.final:
+        targets.append(raw_data.final)
+    legs = len(targets) - 1
+    needed = [key_of[order[t + 1]] if t + 1 < len(order) else None for t in range(legs)]
+
+    items = defaultdict(list)
+    for area in order[1:]:
+        key = key_of[area]
+        items[key.position.area].append(_Item(key, leg_of[key.position.area], leg_of[area] - 1))
+
+    bit = {k: 1 << i for i, k in enumerate(sorted(raw_data.keys))}
+    keys_at = defaultdict(int)
+    for key in raw_data.keys:
+        keys_at[key.position] |= bit[key]
+    keys_in = {area: sum(bit[i.key] for i in found) for area, found in items.items()}
+
+    tours = dict()
+
+    def tour(start, rooms, end) -> int:
+        # shortest walk from start through every room to end, Held-Karp
+        if (start, rooms, end) not in tours:
+            best = {(1 << i, i): distance(start, room) for i, room in enumerate(rooms)}
+            for mask in range(1, 1 << len(rooms)):
+                for i in range(len(rooms)):
+                    if (mask, i) not in best:
+                        continue
+                    for j, room in enumerate(rooms):
+                        if not mask >> j & 1:
+                            step = best[(mask, i)] + distance(rooms[i], room)
+                            if step < best.get((mask | 1 << j, j), step + 1):
+                                best[(mask | 1 << j, j)] = step
+            full = (1 << len(rooms)) - 1
+            tours[(start, rooms, end)] = min(
+                    (best[(full, i)] + distance(room, end) for i, room in enumerate(rooms)),
+                    default=distance(start, end))
+        return tours[(start, rooms, end)]
+
+    def extra(area, rooms, origin, destination) -> int:
+        # what picking up `rooms` of `area` adds to the walk from origin to
+        # destination, a lower bound when `area` is off its way
+        if not rooms:
+            return 0
+        (towards_origin, from_origin) = hops[area][origin.area]
+        (towards_destination, to_destination) = hops[area][destination.area]
+        if from_origin + to_destination == hops[origin.area][destination.area][1]:
+            start = origin if area == origin.area else side[(area, towards_origin)]
+            end = destination if area == destination.area else side[(area, towards_destination)]
+            return tour(start, rooms, end) - distance(start, end)
+        door = side[(area, towards_origin)]
+        return 2 + tour(door, rooms, door)
+
+    def choices(area, mask, leg, origin, destination, rest):
+        # the least `area` adds picking up some of `mask` on this leg and the
+        # others later
+        found = items[area]
+        can = sum(1 << i for i, item in enumerate(found) if item.first <= leg <= item.last)
+        must = sum(1 << i for i, item in enumerate(found) if item.last == leg)
+        best = None
+        for subset in _subsets(mask & can):
+            if must & mask & ~subset or (mask & ~subset) not in rest:
+                continue
+            rooms = tuple(sorted({found[i].key.position for i in range(len(found)) if subset >> i & 1}))
+            cost = extra(area, rooms, origin, destination) + rest[mask & ~subset]
+            best = cost if best is None else min(best, cost)
+        return best
+
+    # later[area][leg][mask], the least the keys of `mask` add from `leg` on
+    later = dict()
+    for area, found in items.items():
+        first = min(item.first for item in found)
+        last = max(item.last for item in found)
+        table = {last + 1: {0: 0}}
+        for leg in range(last, first - 1, -1):
+            row = dict()
+            for mask in _subsets((1 << len(found)) - 1):
+                cost = choices(area, mask, leg, targets[leg], targets[leg + 1], table[leg + 1])
+                if cost is not None:
+                    row[mask] = cost
+            table[leg] = row
+        later[area] = (first, last, table)
+
+    def cost_later(area, leg, mask) -> int:
+        first, last, table = later[area]
+        if leg > last:
+            return 0 if not mask else None
+        return table[max(leg, first)].get(mask)
+
+    remaining = [0]*(legs + 1)
+    unopened = [0]*(legs + 1)
+    for t in range(legs - 1, -1, -1):
+        remaining[t] = remaining[t + 1] + distance(targets[t], targets[t + 1])
+        unopened[t] = unopened[t + 1] + sum(
+                cost_later(area, t + 1, (1 << len(items[area])) - 1)
+                for area in order[t + 1:t + 2] if area in items)
+
+    def estimate(vertex, leg, held):
+        if leg == legs:
+            return 0
+        total = distance(vertex, targets[leg + 1]) + remaining[leg + 1] + unopened[leg]
+        for area in order[:leg + 1]:
+            if keys_in.get(area, 0) & ~held:
+                mask = sum(1 << i for i, item in enumerate(items[area]) if not held & bit[item.key])
+                rest = dict()
+                for subset in _subsets(mask):
+                    later_cost = cost_later(area, leg + 1, subset)
+                    if later_cost is not None:
+                        rest[subset] = later_cost
+                cost = choices(area, mask, leg, vertex, targets[leg + 1], rest)
+                if cost is None:
+                    return None
+                total += cost
+        return total
+
+    start = (raw_data.initial, 0, keys_at[raw_data.initial])
+    parent = {start: None}
+    cost = {start: 0}
+    closed = defaultdict(list)
+    queue = [(estimate(*start), 0, start)]
+
+    while queue:
+        _, steps, state = heappop(queue)
+        steps = -steps
+        vertex, leg, held = state
+        if steps > cost[state]:
+            continue
+        if leg == legs:
+            break
+        # holding more keys in the same room for no more steps is never worse
+        if any(m | held == m and s <= steps for m, s in closed[(vertex, leg)]):
+            continue
+        closed[(vertex, leg)].append((held, steps))
+
+        stops = [room for area in order[:leg + 1] for room in {i.key.position for i in items.get(area, ())}
+                 if keys_at[room] & ~held]
+        moves = [(room, leg) for room in stops]
+        if needed[leg] is None or held & bit[needed[leg]]:
+            moves.append((targets[leg + 1], leg + 1))
+
+        for other, new_leg in moves:
+            new_state = (other, new_leg, held | keys_at[other])
+            new_steps = steps + distance(vertex, other)
+            if new_steps < cost.get(new_state, new_steps + 1):
+                left = estimate(*new_state)
+                if left is None:
+                    continue
+                cost[new_state] = new_steps
+                parent[new_state] = state
+                # the deepest state first among equals
+                heappush(queue, (new_steps + left, -new_steps, new_state))
+    else:
+        raise ValueError('the map has no walkthrough')
+
+    stops = list()
+    while state is not None:
+        stops.append(state[0])
+        state = parent[state]
+    stops.reverse()
+
+    route = [stops[0]]
+    for origin, destination in zip(stops, stops[1:]):
+        distance(origin, destination)  # makes sure the search from destination is there
+        previous = searches[destination][1]
+        vertex = previous[origin]
+        while vertex is not None:
+            route.append(vertex)
+            vertex = previous[vertex]
+
+    keys_by_place = defaultdict(list)
+    for key in sorted(raw_data.keys):
+        keys_by_place[key.position].append(key)
+
+    visited = set()
+    keys = list()
+    for vertex in route:
+        if vertex not in visited:
+            visited.add(vertex)
+            keys.extend(keys_by_place[vertex])
+
+    return Solution(
+            route = tuple(route),
+            keys = tuple(keys),
+            backtracking = len(route) - len(visited),
+            )
@@ -0,0 +1,192 @@
+from collections import Counter, defaultdict
+from typing import NamedTuple, Mapping
+
+import gc
+import json
+
+from . import datamodels
+from .map_generators import Raw
+from .text_generators import MapBuilder
+from .text_generators.text_generators import _per_thread, intro_letter
+
+
+__doc__ = '''
+Renders a map straight to a sink, for maps too big to be kept as a single
+`datamodels.Map`.
+
+Passages and keys are final as soon as they are created, they are written
+right away. A room is written, and everything it holds is dropped, once
+every passage it has was created, so the builder only keeps the rooms still
+waiting for a passage. `stream_map` creates the passages area by area, the
+ones linking two areas with the later of them, so those are the first
+rooms of areas whose door to a later area is still to be made.
+
+Besides the `Raw` itself, which the caller holds, `stream_map` keeps the
+edges and rooms grouped by area, a pointer each, and the builder only the
+rooms of the current area and the ones behind a door still to be made, well
+under a megabyte. What tracery leaves behind is cyclic garbage, the young
+part of it is collected after every area and all of it every
+`_FULL_COLLECTION` rooms, so the rest of the memory depends on the size of
+the areas, not of the map. Traced, a raw map of 13k rooms peaks at about
+5 MB, one of 126k rooms in 300 areas at about 24 MB, next to the 65 MB of
+the `Raw` it was given.
+'''
+
+
+# rooms written between two full garbage collections
+_FULL_COLLECTION = 10000
+
+
+class Header(NamedTuple):
+    introducion_letter: str
+    name: str
+    descritption: str
+    first_ambient: str
+
+
+class JsonLinesSink():
+    '''One json object per line, its `type` telling which record it is'''
+
+    def __init__(self, file):
+        self.file = file
+
+    def write(self, kind, record):
+        self.file.write(json.dumps({'type': kind, **record._asdict()}, ensure_ascii=False))
+        self.file.write('\n')
+
+
+def read_map(lines) -> datamodels.Map:
+    header = None
+    parts = {'ambient': list(), 'passage': list(), 'key': list()}
+    for line in lines:
+        record = json.loads(line)
+        kind = record.pop('type')
+        if kind == 'map':
+            header = Header(**record)
+        elif kind == 'ambient':
+            record['passages'] = tuple(record['passages'])
+            record['decorations'] = tuple(record['decorations'])
+            parts[kind].append(datamodels.Ambient(**record))
+        elif kind == 'passage':
+            parts[kind].append(datamodels.Passage(**record))
+        elif kind == 'key':
+            parts[kind].append(datamodels.Key(**record))
+        else:
+            raise ValueError(f'unknown record type {kind}')
+
+    if header is None:
+        raise ValueError('the stream has no map header')
+    return datamodels.Map(
+            *header,
+            ambients = tuple(parts['ambient']),
+            passages = tuple(parts['passage']),
+            keys = tuple(parts['key']),
+            )
+
+
+class StreamingMapBuilder(MapBuilder):
+    '''
+    `degrees` maps every room id to the number of passages it will have,
+    a room is made and written when the last of them is created. Rooms can
+    also be announced later, with `expect`, before their first passage.
+    '''
+
+    def __init__(self, sink, degrees: Mapping[str, int] = None):
+        super().__init__()
+        self.sink = sink
+        self.pending = dict(degrees or ())
+
+    def expect(self, _id, passages):
+        self.pending[_id] = self.pending.get(_id, 0) + passages
+
+    def write_header(self):
+        self.sink.write('map', Header(
+                introducion_letter = next(_per_thread(intro_letter)),
+                name = self.context.map.name,
+                descritption = self.context.map.describe(),
+                first_ambient = self.first_ambient,
+                ))
+
+    def create_passage(self, _from, _to, _where, passage_type=None, flavor=None):
+        super().create_passage(_from, _to, _where, passage_type, flavor)
+
+        a_side = self.passage_map[_from][_to]
+        b_side = self.passage_map[_to][_from]
+        a_side.freeze()
+        b_side.freeze()
+        self.sink.write('passage', datamodels.Passage(_to, _from, a_side.describe()))
+        self.sink.write('passage', datamodels.Passage(_from, _to, b_side.describe()))
+
+        if (_from, _to) in self.key_map:
+            inst = self.key_map.pop((_from, _to))
+            inst.freeze()
+            self.sink.write('key', self._key_model(_from, _to, inst))
+            del self.key_place_map[(_from, _to)]
+
+        for _id in (_from, _to):
+            self.pending[_id] -= 1
+            if not self.pending[_id]:
+                self.create_ambient(_id)
+
+    def create_ambient(self, _id, place_type=None):
+        super().create_ambient(_id, place_type)
+        inst = self.ambient_map.pop(_id)
+        inst.freeze()
+        self.sink.write('ambient', self._ambient_model(_id, inst))
+
+        del self.pending[_id]
+        self.passage_map.pop(_id, None)
+
+    def finish(self):
+        # rooms without any passage are never completed by one
+        for _id in [i for i, count in self.pending.items() if not count]:
+            self.create_ambient(_id)
+        if self.pending:
+            raise ValueError(f'{len(self.pending)} rooms are still missing passages')
+
+    def build(self, deadline=None):
+        raise TypeError('a streaming builder writes to its sink, it builds no map')
+
+
+def stream_map(raw_data: Raw, sink):
+    rooms = defaultdict(list)
+    for vertex in raw_data.vertexes:
+        rooms[vertex.area].append(vertex)
+    # every edge goes with the later of the areas it links
+    edges = defaultdict(list)
+    doors = Counter()
+    for edge in raw_data.edges:
+        edges[max(edge.origin.area, edge.destin.area)].append(edge)
+        if edge.origin.area != edge.destin.area:
+            doors[min(edge.origin, edge.destin, key=lambda v: v.area).identifier] += 1
+
+    builder = StreamingMapBuilder(sink)
+    builder.first_ambient = raw_data.initial.identifier
+    builder.write_header()
+
+    locked_edges = {k.door: k for k in raw_data.keys}
+    written = 0
+    for area in sorted(rooms.keys() | edges.keys()):
+        # the rooms of an area, with their doors to later areas, are known
+        # before any of their passages is made
+        area_rooms = rooms.pop(area, ())
+        written += len(area_rooms)
+        for vertex in area_rooms:
+            builder.expect(vertex.identifier, doors.pop(vertex.identifier, 0))
+        area_edges = sorted(edges.pop(area, ()))
+        for edge in area_edges:
+            for vertex in (edge.origin, edge.destin):
+                if vertex.area == area:
+                    builder.expect(vertex.identifier, 1)
+        for edge in area_edges:
+            builder.create_passage(edge.origin.identifier, edge.destin.identifier, locked_edges.get(edge))
+        # what tracery leaves of the rooms is cyclic, some of it old enough
+        # to wait for a full collection, which the objects of a big `Raw`
+        # make rare; a full one costs a pass over all of them
+        if written >= _FULL_COLLECTION:
+            written = 0
+            gc.collect()
+        else:
+            gc.collect(1)
+
+    builder.finish()
@@ -1,5 +1,7 @@
-from .. import generate_json
+from .. import generate_json, generate_batch, Constraints, RawSampler, DeadlineExceeded
+from .. import build_map, raw, Level, generate_map, fallback_map
 from json import loads
+from concurrent.futures import ThreadPoolExecutor
 from pprint import pp
 
 
@@ -10,3 +12,66 @@ def test_is_json():
         assert True
     except:
         assert False
+
+
+def test_generate_batch():
+    batch = list(generate_batch(3))
+    assert len(batch) == 3
+    for j in batch:
+        assert loads(j)['ambients']
+
+
+def test_generate_with_sampler():
+    sampler = RawSampler(Constraints(min_locked_doors=2))
+    assert loads(generate_json(sampler))
+    list(generate_batch(2, sampler=sampler))
+    assert sampler.accepted >= 3
+
+
+def test_generate_json_threaded():
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        for j in pool.map(lambda _: generate_json(), range(32)):
+            assert loads(j)['name']
+
+
+def test_generate_json_deadline():
+    try:
+        generate_json(timeout=0)
+        assert False
+    except DeadlineExceeded:
+        pass
+
+    assert loads(generate_json(timeout=0, fallback=True))['ambients']
+    assert loads(generate_json(timeout=60))
+
+
+def test_fallback_built_once():
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        maps = list(pool.map(lambda _: generate_map(timeout=0, fallback=True), range(16)))
+    assert all(m is fallback_map() for m in maps)
+
+
+def test_fallback_levels():
+    for level in Level:
+        _map = generate_map(timeout=0, fallback=True, level=level)
+        assert _map is fallback_map(level)
+        assert all(a.descritption for a in _map.ambients) == (level != Level.TOPOLOGY)
+        assert bool(_map.descritption) == (level == Level.FULL)
+
+
+def test_generate_levels():
+    raw_data = raw(4, 5)
+    for level in Level:
+        _map = build_map(raw_data, level=level)
+        assert {a.id for a in _map.ambients} == {v.identifier for v in raw_data.vertexes}
+        assert len(_map.passages) == 2*len(raw_data.edges)
+        assert len(_map.keys) == len(raw_data.keys)
+        assert _map.first_ambient == raw_data.initial.identifier
+
+        described = all(a.descritption for a in _map.ambients)
+        assert described == (level != Level.TOPOLOGY)
+        assert bool(_map.name) == (level != Level.TOPOLOGY)
+        assert bool(_map.descritption) == (level == Level.FULL)
+        assert loads(_map.as_json())
+
+    assert loads(generate_json(level=Level.TOPOLOGY))['name'] == ''
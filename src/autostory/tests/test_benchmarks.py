@@ -0,0 +1,33 @@
+from .. import benchmarks
+from ..benchmarks import Measure
+
+
+def test_compare():
+    baseline = {'raw': Measure(1000.0, 0.002, 0.004, 4096, 0.01)}
+
+    faster = benchmarks.compare(baseline, {'raw': Measure(1050.0, 0.0019, 0.0045, 4096, 0.01)})
+    assert len(faster) == 4 and not any(c.regressed for c in faster)
+
+    slower = benchmarks.compare(baseline, {'raw': Measure(800.0, 0.002, 0.004, 4096, 0.01)})
+    assert [c.metric for c in slower if c.regressed] == ['throughput']
+
+    # a noisy run widens the tolerance
+    noisy = benchmarks.compare(baseline, {'raw': Measure(800.0, 0.002, 0.004, 4096, 0.1)})
+    assert not any(c.regressed for c in noisy)
+
+    assert benchmarks.compare(baseline, {'build_map': Measure(10.0, 0.1, 0.2, 1, 0.0)}) == []
+
+    tail = benchmarks.compare(baseline, {'raw': Measure(1000.0, 0.002, 0.008, 4096, 0.01)})
+    assert [c.metric for c in tail if c.regressed] == ['p999']
+
+
+def test_missing_baseline(tmp_path):
+    assert benchmarks.main(['--baseline', str(tmp_path/'missing.json'), 'as_json']) == 1
+    assert benchmarks.main(['--baseline', str(tmp_path/'missing.json'), '--update', 'as_json']) == 0
+
+
+def test_baseline_round_trip(tmp_path):
+    measures = {'raw': Measure(1000.0, 0.002, 0.004, 4096, 0.01)}
+    benchmarks.store(tmp_path/'baseline.json', measures)
+    assert benchmarks.load(tmp_path/'baseline.json') == measures
+    assert benchmarks.load(tmp_path/'missing.json') == dict()
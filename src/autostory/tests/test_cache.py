@@ -0,0 +1,64 @@
+from .. import cache, datamodels, compression
+
+import zlib
+
+
+def _fake_map(seed, size, size_factor):
+    ambients = tuple(
+            datamodels.Ambient(f'{seed}_{i}', 'uma sala empoeirada ' * size_factor, (), ())
+            for i in range(size))
+    return datamodels.Map('carta', 'nome', 'descrição', ambients[0].id, ambients, (), ())
+
+
+def test_cache_hit(tmp_path):
+    calls = list()
+
+    def generate(*args):
+        calls.append(args)
+        return _fake_map(*args)
+
+    _cache = cache.MapCache(tmp_path, generate=generate)
+    first = _cache.get_or_generate(1, 3, 5)
+    assert _cache.get_or_generate(1, 3, 5) == first
+    assert cache.MapCache(tmp_path, generate=generate).get(1, 3, 5) == first
+    assert _cache.get_or_generate(2, 3, 5) != first
+    assert calls == [(1, 3, 5), (2, 3, 5)]
+    assert (_cache.hits, _cache.misses) == (1, 2)
+
+
+def test_cache_eviction(tmp_path):
+    _cache = cache.MapCache(tmp_path, max_bytes=0, generate=_fake_map)
+    _cache.get_or_generate(1)
+    assert not list(tmp_path.iterdir())
+
+    _cache.max_bytes = 10**6
+    for seed in range(3):
+        _cache.get_or_generate(seed)
+    sizes = [p.stat().st_size for p in tmp_path.iterdir()]
+    assert len(sizes) == 3
+
+    _cache.max_bytes = sum(sizes) - 1
+    _cache.evict()
+    assert len(list(tmp_path.iterdir())) == 2
+
+
+def test_damaged_entry(tmp_path):
+    _cache = cache.MapCache(tmp_path, generate=_fake_map)
+    _cache.get_or_generate(1)
+    _cache.path(1, 3, 5).write_bytes(b'not a map')
+    assert _cache.get(1, 3, 5) is None
+    assert not _cache.path(1, 3, 5).exists()
+
+    # valid json, but not a map
+    for text in (b'{"name": "nome"}', b'{"ambients": 1}', b'[]'):
+        compressor = zlib.compressobj(9, zdict=compression.DICTIONARY)
+        _cache.path(1, 3, 5).write_bytes(compressor.compress(text) + compressor.flush())
+        assert _cache.get(1, 3, 5) is None
+        assert not _cache.path(1, 3, 5).exists()
+
+
+def test_generated_map(tmp_path):
+    _cache = cache.MapCache(tmp_path)
+    _map = _cache.get_or_generate(7, 3, 4)
+    assert _cache.get(7, 3, 4) == _map
+    assert all(a.descritption for a in _map.ambients)
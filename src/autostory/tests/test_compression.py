@@ -0,0 +1,48 @@
+import json
+import zlib
+
+from .. import compression, build_map, raw, datamodels
+
+
+def test_round_trip():
+    _map = build_map(raw(4, 5))
+    data = compression.compress(_map)
+    assert compression.decompress(data) == _map
+    assert datamodels.Map.from_json(_map.as_json()) == _map
+
+
+def test_dictionary_helps():
+    _map = build_map(raw(3, 4))
+    text = json.dumps(_map.as_dict(), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    assert len(compression.compress(_map)) < len(zlib.compress(text, 9))
+
+
+def test_older_dictionary():
+    _map = build_map(raw(3, 4))
+    text = json.dumps(_map.as_dict(), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    older = b'a dictionary of an older version of the content tables'
+    compressor = zlib.compressobj(9, zdict=older)
+    data = compressor.compress(text) + compressor.flush()
+    try:
+        compression.decompress(data)
+    except ValueError:
+        pass
+    else:
+        assert False
+
+    compression.DICTIONARIES[zlib.adler32(older)] = older
+    try:
+        assert compression.decompress(data) == _map
+    finally:
+        del compression.DICTIONARIES[zlib.adler32(older)]
+    assert compression.decompress(zlib.compress(text)) == _map
+
+
+def test_truncated():
+    data = compression.compress(build_map(raw(3, 4)))
+    try:
+        compression.decompress(data[:len(data)//2])
+    except ValueError:
+        pass
+    else:
+        assert False
@@ -0,0 +1,36 @@
+from .. import constraints
+from ..map_generators import Raw, Vertex, Edge, Key
+
+
+def test_metrics():
+    a, b, c, d = Vertex(0, 0), Vertex(1, 0), Vertex(1, 1), Vertex(1, 2)
+    door = Edge(b, a)
+    _map = Raw(
+            vertexes = {a, b, c, d},
+            edges = {door, Edge(c, b), Edge(d, c)},
+            keys = {Key(c, door)},
+            initial = d,
+            final = a)
+
+    _metrics = constraints.metrics(_map)
+    assert _metrics.shortest_path == 3
+    assert _metrics.locked_doors == 1
+    assert _metrics.dead_end_ratio == 0.5
+
+
+def test_raw_sampler():
+    target = constraints.Constraints(min_shortest_path=6, min_locked_doors=2, max_dead_end_ratio=0.6)
+    sampler = constraints.RawSampler(target, size=4, size_factor=5)
+    for _ in range(5):
+        assert target.accepts(constraints.metrics(sampler.sample()))
+    assert sampler.accepted == 5
+    assert sampler.attempts >= 5
+    assert 0 < sampler.acceptance_rate <= 1
+
+    impossible = constraints.RawSampler(constraints.Constraints(min_locked_doors=10), max_attempts=5)
+    try:
+        impossible.sample()
+        assert False
+    except ValueError:
+        pass
+    assert impossible.acceptance_rate == 0
@@ -0,0 +1,44 @@
+from .. import corpus, datamodels, build_map, raw
+
+
+def _map(intro, *descriptions):
+    ambients = tuple(datamodels.Ambient(f'0_{i}', d, (), ()) for i, d in enumerate(descriptions))
+    return datamodels.Map(intro, '', '', ambients[0].id, ambients, (), ())
+
+
+def test_corpus_stats():
+    maps = (
+            _map('carta a', 'Uma sala muito suja e fria, uma sala muito suja.', 'Um quarto sombrio.'),
+            _map('carta b', 'Uma cozinha suja.'),
+            _map('carta a', 'Um porão mal iluminado.'),
+            )
+    report = corpus.CorpusStats(width=256, top=3).consume(iter(maps)).report()
+
+    assert (report['maps'], report['rooms']) == (3, 4)
+    assert report['adjectives']['total'] == 6
+    assert report['adjectives']['most_common'][0] == ('muito suja', 2)
+    assert report['adjectives']['distinct'] == 5
+    assert report['bigram_repeats']['rooms_by_repeats'] == {0: 3, 3: 1}
+    assert ('uma sala', 1) in report['bigram_repeats']['most_common']
+    assert report['intros']['distinct'] == 2
+    assert report['intros']['most_common'][0] == ('carta a', 2)
+
+
+def test_sketches():
+    sketch = corpus.CountMinSketch(width=64, depth=4)
+    counter = corpus.HyperLogLog(precision=10)
+    for i in range(5000):
+        sketch.add(str(i % 100))
+        counter.add(str(i % 1000))
+    assert all(sketch.estimate(str(i)) >= 50 for i in range(100))
+    assert abs(counter.count() - 1000) < 100
+
+    other = corpus.CountMinSketch(width=64, depth=4)
+    other.add('0', 10)
+    sketch.merge(other)
+    assert sketch.estimate('0') >= 60 and sketch.total == 5010
+
+
+def test_generated_maps():
+    report = corpus.CorpusStats().consume(build_map(raw(3, 4)) for _ in range(3)).report()
+    assert report['rooms'] > 3 and report['adjectives']['total'] > 0
@@ -0,0 +1,37 @@
+import random
+
+from .. import hierarchy
+
+
+def test_lazy_expansion():
+    estate = hierarchy.Estate(seed=5, shapes=((4, 5), (3, 4), (3, 4)))
+    assert estate.generated == 0
+
+    path = estate.entrance()
+    assert len(path) == 3
+    assert estate.generated == 3
+
+    floor = estate.node(path[:1])
+    assert floor.expanded
+    assert not estate.node(path[:1] + (floor.raw.final,)).expanded
+    assert estate.generated == 3
+
+    assert estate.root.identifier(path[0]) == path[0].identifier
+    assert floor.identifier(path[1]) == f'{path[0].identifier}/{path[1].identifier}'
+
+
+def test_node_independent_of_visit_order():
+    shapes = ((4, 5), (3, 5))
+    first = hierarchy.Estate(seed=9, shapes=shapes)
+    second = hierarchy.Estate(seed=9, shapes=shapes)
+
+    vertexes = sorted(first.root.raw.vertexes)
+    first_raws = [first.root.enter(v).raw for v in vertexes]
+    random.seed(1)
+    second_raws = [second.root.enter(v).raw for v in reversed(vertexes)]
+    assert first_raws == second_raws[::-1]
+    assert first.root.raw == second.root.raw
+
+    state = random.getstate()
+    hierarchy.Estate(seed=9, shapes=shapes).root.raw
+    assert random.getstate() == state
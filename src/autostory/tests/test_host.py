@@ -0,0 +1,71 @@
+import asyncio
+import json
+
+from .. import host, topology_map, raw
+
+
+def test_local_session():
+    raw_data = raw(3, 4)
+    session_host = host.SessionHost({'mansion': topology_map(raw_data)})
+
+    async def play():
+        client = host.LocalClient(session_host)
+        assert 'error' in await client.send('look')
+        assert 'error' in await client.send('open castle')
+
+        view = await client.send('open mansion')
+        assert view['room'] == raw_data.initial.identifier
+        assert session_host.connections == 1
+
+        taken = await client.send('take')
+        assert len(taken['keys']) == sum(1 for k in raw_data.keys if k.position == raw_data.initial)
+
+        exit = next(e for e in view['exits'] if not e['locked'])
+        assert (await client.send(f'go {exit["room"]}'))['room'] == exit['room']
+        assert 'error' in await client.send('go nowhere')
+
+        state = (await client.send('save'))['state']
+        other = host.LocalClient(session_host)
+        assert (await other.send(f'resume mansion {state}'))['room'] == exit['room']
+
+        await client.close()
+        try:
+            await other.send('quit')
+        except ConnectionError:
+            pass
+        else:
+            assert False
+        await other.task
+        assert session_host.connections == 0
+
+    asyncio.run(play())
+
+
+def test_bad_lines():
+    session_host = host.SessionHost({'mansion': topology_map(raw(3, 4))})
+
+    async def play():
+        client = host.LocalClient(session_host)
+        client.requests.feed_data(b'open \xffmansion\n')
+        assert 'error' in json.loads(await client.replies.readline())
+        client.requests.feed_data(b'look ' + b'x'*(1 << 17) + b'\n')
+        assert json.loads(await client.replies.readline()) == {'error': 'line too long'}
+        assert (await client.send('open mansion'))['room']
+
+        # the end of a long line arrives after the reader gave up on it
+        for _ in range(20):
+            client.requests.feed_data(b'x'*8192)
+            await asyncio.sleep(0)
+        client.requests.feed_data(b'\n')
+        assert json.loads(await client.replies.readline()) == {'error': 'line too long'}
+        assert (await client.send('look'))['room']
+        await client.close()
+        assert session_host.connections == 0
+
+    asyncio.run(play())
+
+
+def test_benchmark():
+    session_host = host.SessionHost({'mansion': topology_map(raw(3, 4))})
+    session_bytes, rate, latencies = asyncio.run(host._benchmark(session_host, 'mansion', 20, 10))
+    assert len(latencies) == 20*10 and rate > 0 and session_bytes > 0
@@ -0,0 +1,50 @@
+from .. import layouts, map_generators, build_map
+from itertools import islice
+
+
+def test_reskin_raw():
+    raw = map_generators.raw(4, 5)
+    layout = layouts.Layout.from_raw(raw)
+    maps = list(layouts.reskin(layout, 3))
+    assert len(maps) == 3
+
+    for _map in maps:
+        assert {a.id for a in _map.ambients} == {v.identifier for v in raw.vertexes}
+        assert len(_map.passages) == 2*len(raw.edges)
+        assert len(_map.keys) == len(raw.keys)
+        assert _map.first_ambient == raw.initial.identifier
+
+    assert len({m.ambients for m in maps}) > 1
+    # the prose changes between renders
+
+
+def test_reskin_map():
+    _map = build_map(map_generators.raw(4, 5))
+    layout = layouts.Layout.from_map(_map)
+    assert len(layout.passages) == len(_map.passages)//2
+    assert len([p for p in layout.passages if p.key_place]) == len(_map.keys)
+
+    for other in islice(layouts.reskin(_map), 2):
+        assert {(p.origin, p.destination) for p in other.passages} == \
+                {(p.origin, p.destination) for p in _map.passages}
+        assert {(k.origin, k.destination, k.place) for k in other.keys} == \
+                {(k.origin, k.destination, k.place) for k in _map.keys}
+
+
+def test_reskin_map_keeps_door_directions():
+    # with 10 areas and more, room ids no longer sort by area
+    _map = build_map(map_generators.raw(12, 4))
+    other = layouts.Layout.from_map(_map).render()
+    assert [(k.origin, k.destination, k.place) for k in other.keys] == \
+            [(k.origin, k.destination, k.place) for k in _map.keys]
+
+
+def test_reskin_map_without_key_origins():
+    _map = build_map(map_generators.raw(4, 5))
+    older = _map._replace(keys=tuple(k._replace(origin=None) for k in _map.keys))
+    try:
+        layouts.Layout.from_map(older)
+    except ValueError:
+        pass
+    else:
+        assert False
@@ -1,5 +1,6 @@
 from .. import map_generators
 import collections
+import random
 
 
 def test_raw_generation():
@@ -53,3 +54,35 @@ def test_key_shuffle():
         count += len(tuple(k for k in _map.keys if k[0] in k[1]))
     assert count == 0
     # assert that the key is not in the room where its door is most of the time
+
+
+def _relabel(_map, mapping):
+    edge = lambda e: map_generators.Edge(mapping[e.origin], mapping[e.destin])
+    return map_generators.Raw(
+        vertexes = {mapping[v] for v in _map.vertexes},
+        edges = {edge(e) for e in _map.edges},
+        keys = {map_generators.Key(mapping[k.position], edge(k.door)) for k in _map.keys},
+        initial = mapping[_map.initial],
+        final = mapping[_map.final])
+
+
+def test_fingerprint():
+    for _ in range(20):
+        _map = map_generators.raw(5, 5)
+        vertexes = list(_map.vertexes)
+        shuffled = list(vertexes)
+        random.shuffle(shuffled)
+        relabeled = _relabel(_map, dict(zip(vertexes, shuffled)))
+        assert map_generators.fingerprint(_map) == map_generators.fingerprint(relabeled)
+        # the fingerprint does not depend on vertex numbering
+
+        other = map_generators.raw(6, 5)
+        assert map_generators.fingerprint(_map) != map_generators.fingerprint(other)
+
+
+def test_unique_raws():
+    seen = set()
+    maps = list(map_generators.unique_raws(30, seen=seen))
+    assert len(maps) == 30
+    assert len({map_generators.fingerprint(m) for m in maps}) == 30
+    assert len(seen) == 30
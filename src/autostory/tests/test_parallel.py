@@ -0,0 +1,51 @@
+import random
+
+from .. import parallel, map_generators
+
+
+def test_render_parallel():
+    raw = map_generators.raw(4, 5)
+    _map = parallel.render_parallel(raw, seed=7, workers=1)
+
+    assert len(_map.ambients) == len(raw.vertexes)
+    assert len(_map.passages) == 2*len(raw.edges)
+    assert len(_map.keys) == len(raw.keys)
+    assert _map.first_ambient == raw.initial.identifier
+    assert all(a.descritption for a in _map.ambients)
+
+
+def test_render_parallel_deterministic():
+    raw = map_generators.raw(4, 5)
+    serial = parallel.render_parallel(raw, seed=3, workers=1)
+    assert serial == parallel.render_parallel(raw, seed=3, workers=1)
+    assert serial == parallel.render_parallel(raw, seed=3, workers=2)
+    assert serial != parallel.render_parallel(raw, seed=4, workers=1)
+
+
+def test_parallel_keeps_random_state():
+    raw = map_generators.raw(4, 5)
+    random.seed(11)
+    state = random.getstate()
+    parallel.render_parallel(raw, seed=3, workers=1)
+    parallel.sharded_raw(5, 5, seed=3, workers=1)
+    assert random.getstate() == state
+
+
+def test_sharded_raw():
+    _map = parallel.sharded_raw(12, 5, seed=1, workers=1)
+    assert _map == parallel.sharded_raw(12, 5, seed=1, workers=2)
+
+    assert _map.vertexes.issuperset({map_generators.Vertex(i, 0) for i in range(12)})
+    assert len(_map.keys) == 11
+    assert len(tuple(e for e in _map.edges if e.origin.area != e.destin.area)) == 11
+    for room, door in _map.keys:
+        assert room.area > min(door, key=lambda r: r.area).area
+        assert room not in door
+    for edge in _map.edges:
+        assert edge.origin in _map.vertexes and edge.destin in _map.vertexes
+
+
+def test_generate_world():
+    world = parallel.generate_world(5, 5, seed=2, workers=2)
+    assert world == parallel.generate_world(5, 5, seed=2, workers=1)
+    assert len(world.keys) == 4
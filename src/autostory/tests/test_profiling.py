@@ -0,0 +1,75 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
+
+import pstats
+import os
+import tracemalloc
+
+from .. import profiling
+
+
+def test_profiled(tmp_path):
+    @profiling.profiled('outer')
+    def outer():
+        return inner()
+
+    @profiling.profiled('inner')
+    def inner():
+        return [str(i) for i in range(1000)]
+
+    profiler = profiling.enable(cpu=True, memory=True, directory=tmp_path, every=2)
+    try:
+        for _ in range(4):
+            assert len(outer()) == 1000
+        inner()
+    finally:
+        profiling.disable()
+
+    pid = os.getpid()
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+            f'outer-{pid}-2.memory.txt', f'outer-{pid}-2.prof',
+            f'outer-{pid}-4.memory.txt', f'outer-{pid}-4.prof',
+            ]
+    assert profiler.runs == {'outer': 4, 'inner': 1}
+    assert pstats.Stats(str(next(tmp_path.glob('*.prof')))).total_calls
+    assert next(tmp_path.glob('*.memory.txt')).read_text().startswith('peak: ')
+
+
+def test_overlapping_memory_runs(tmp_path):
+    started = Event()
+    runs = list()
+
+    @profiling.profiled('short')
+    def short():
+        started.wait(5)
+        return [str(i) for i in range(100)]
+
+    @profiling.profiled('long')
+    def long():
+        started.set()
+        # the first run to start tracing ends while this one still traces
+        runs[0].result(5)
+        return [str(i) for i in range(1000)]
+
+    profiling.enable(cpu=False, memory=True, directory=tmp_path)
+    try:
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            runs.append(pool.submit(short))
+            runs.append(pool.submit(long))
+            assert [len(r.result(10)) for r in runs] == [100, 1000]
+    finally:
+        profiling.disable()
+
+    assert not tracemalloc.is_tracing()
+    assert len(list(tmp_path.glob('*.memory.txt'))) == 2
+
+
+def test_from_environment():
+    assert profiling.Profiler.from_environment({}) is None
+    assert profiling.Profiler.from_environment({'AUTOSTORY_PROFILE': '0'}) is None
+
+    profiler = profiling.Profiler.from_environment({
+        'AUTOSTORY_PROFILE': 'memory',
+        'AUTOSTORY_PROFILE_EVERY': '10',
+        })
+    assert (profiler.cpu, profiler.memory, profiler.every) == (False, True, 10)
@@ -0,0 +1,48 @@
+from .. import runtime, topology_map, raw, solver
+
+
+def test_walkthrough():
+    raw_data = raw(4, 5)
+    world = runtime.World(topology_map(raw_data))
+    session = world.session()
+    assert session.position == raw_data.initial.identifier
+
+    solution = solver.solve(raw_data)
+    for vertex in solution.route[1:]:
+        session.pick_up()
+        session.move(vertex.identifier)
+    assert session.position == raw_data.final.identifier
+
+
+def test_locked_door():
+    raw_data = raw(3, 4)
+    world = runtime.World(topology_map(raw_data))
+
+    door = sorted(raw_data.keys)[0].door
+    session = world.session(door.origin.identifier)
+    assert session.is_locked(door.destin.identifier)
+    try:
+        session.move(door.destin.identifier)
+    except runtime.Locked:
+        pass
+    else:
+        assert False
+
+    session.held.add(world.doors[(door.origin.identifier, door.destin.identifier)])
+    assert session.move(door.destin.identifier).id == door.destin.identifier
+    assert not session.is_locked(door.origin.identifier)
+
+
+def test_look():
+    raw_data = raw(3, 4)
+    world = runtime.World(topology_map(raw_data))
+    session = world.session()
+
+    view = session.look()
+    assert view.ambient.id == raw_data.initial.identifier
+    assert {p.destination for p in view.exits} == {
+            (e.destin if e.origin == raw_data.initial else e.origin).identifier
+            for e in raw_data.edges if raw_data.initial in e}
+    assert len(view.keys) == sum(1 for k in raw_data.keys if k.position == raw_data.initial)
+    assert session.pick_up() == view.keys
+    assert session.look().keys == ()
@@ -0,0 +1,34 @@
+from .. import runtime, savestate, topology_map, raw, solver
+
+
+def test_round_trip():
+    raw_data = raw(4, 5)
+    world = runtime.World(topology_map(raw_data))
+    session = world.session()
+
+    route = solver.solve(raw_data).route
+    for vertex in route[1:len(route)//2]:
+        session.pick_up()
+        session.move(vertex.identifier)
+
+    data = savestate.save(session)
+    assert len(data) < 40
+
+    loaded = savestate.load(world, data)
+    assert loaded.position == session.position
+    assert loaded.held == session.held
+    assert loaded.opened == session.opened
+    assert savestate.save(loaded) == data
+
+    # the same map read back elsewhere has the same digest
+    assert savestate.load(runtime.World(topology_map(raw_data)), data).held == session.held
+
+
+def test_other_map():
+    data = savestate.save(runtime.World(topology_map(raw(3, 4))).session())
+    try:
+        savestate.load(runtime.World(topology_map(raw(4, 4))), data)
+    except ValueError:
+        pass
+    else:
+        assert False
@@ -0,0 +1,39 @@
+from .. import search, datamodels, build_map, raw
+
+
+def _map(*descriptions):
+    ambients = tuple(
+            datamodels.Ambient(f'0_{i}', text, ('uma porta velha',), ('um sofá sujo',))
+            for i, text in enumerate(descriptions))
+    return datamodels.Map('', 'mapa', '', ambients[0].id, ambients, (), ())
+
+
+def test_queries(tmp_path):
+    index = search.DescriptionIndex(tmp_path/'index.sqlite')
+    assert index.add('a', _map('Uma sala empoeirada e fria.', 'Um quarto frio e empoeirado.'))
+    assert not index.add('a', _map('outra'))
+    index.add('b', _map('Uma sala fria, empoeirada.'))
+
+    assert index.phrase('sala empoeirada') == [search.Hit('a', '0_0')]
+    assert index.phrase('sala fria empoeirada') == [search.Hit('b', '0_0')]
+    assert index.phrase('porta velha') == [search.Hit('a', '0_0'), search.Hit('a', '0_1'), search.Hit('b', '0_0')]
+    # the parts of a room are not one text
+    assert index.phrase('velha um sofá') == []
+    assert index.phrase('sala inexistente') == []
+
+    assert index.together('frio', 'empoeirado') == [search.Hit('a', '0_1')]
+    assert index.together('SALA', 'fria') == [search.Hit('a', '0_0'), search.Hit('b', '0_0')]
+    assert index.cooccurrences('sala', limit=2) == [('empoeirada', 2), ('fria', 2)]
+    index.close()
+
+    reopened = search.DescriptionIndex(tmp_path/'index.sqlite')
+    assert 'b' in reopened
+    assert reopened.phrase('quarto frio') == [search.Hit('a', '0_1')]
+
+
+def test_generated_maps():
+    index = search.DescriptionIndex()
+    _map = build_map(raw(3, 4))
+    index.add('generated', _map)
+    word = search.tokenize(_map.ambients[0].descritption)[-1]
+    assert search.Hit('generated', _map.ambients[0].id) in index.together(word)
@@ -0,0 +1,67 @@
+from .. import solver, map_generators
+from collections import deque
+from time import perf_counter
+
+
+def _shortest_length(_map):
+    # plain BFS over (room, keys) without any pruning
+    start = (_map.initial, frozenset(k for k in _map.keys if k.position == _map.initial))
+    distance = {start: 0}
+    queue = deque([start])
+    while queue:
+        room, keys = queue.popleft()
+        if room == _map.final:
+            return distance[(room, keys)]
+        for edge in _map.edges:
+            if room not in edge:
+                continue
+            if any(k.door == edge for k in _map.keys) and not any(k.door == edge for k in keys):
+                continue
+            other = edge.destin if edge.origin == room else edge.origin
+            state = (other, keys | {k for k in _map.keys if k.position == other})
+            if state not in distance:
+                distance[state] = distance[(room, keys)] + 1
+                queue.append(state)
+
+
+def test_solve():
+    for _ in range(20):
+        _map = map_generators.raw(5, 4)
+        solution = solver.solve(_map)
+        route = solution.route
+
+        assert route[0] == _map.initial
+        assert route[-1] == _map.final
+        assert len(route) - 1 == _shortest_length(_map)
+
+        held = set()
+        for step, (a, b) in enumerate(zip(route, route[1:])):
+            held |= {k for k in _map.keys if k.position == a}
+            edge = {map_generators.Edge(a, b), map_generators.Edge(b, a)} & _map.edges
+            assert edge
+            for k in _map.keys:
+                if k.door in edge:
+                    assert k in held
+
+        assert set(solution.keys) <= {k for k in _map.keys if k.position in route}
+        assert solution.backtracking == len(route) - len(set(route))
+
+
+def test_solve_many_keys():
+    _map = map_generators.raw(40, 5)
+    solution = solver.solve(_map)
+    assert solution.route[-1] == _map.final
+
+
+def test_solve_time():
+    # took about a minute before the areas were entered in order
+    _map = map_generators.raw(80, 6)
+    start = perf_counter()
+    solution = solver.solve(_map)
+    assert perf_counter() - start < 5
+
+    held = set()
+    for a, b in zip(solution.route, solution.route[1:]):
+        held |= {k for k in _map.keys if k.position == a}
+        assert all(k in held for k in _map.keys if k.door in ((a, b), (b, a)))
+    assert solution.route[-1] == _map.final
@@ -0,0 +1,42 @@
+from io import StringIO
+
+from .. import streaming, map_generators
+
+
+def test_stream_map():
+    raw = map_generators.raw(4, 5)
+    output = StringIO()
+    streaming.stream_map(raw, streaming.JsonLinesSink(output))
+
+    _map = streaming.read_map(output.getvalue().splitlines())
+    assert _map.first_ambient == raw.initial.identifier
+    assert {a.id for a in _map.ambients} == {v.identifier for v in raw.vertexes}
+    assert len(_map.ambients) == len(raw.vertexes)
+    assert len(_map.passages) == 2*len(raw.edges)
+    assert {(k.origin, k.destination) for k in _map.keys} == {
+            (k.door.origin.identifier, k.door.destin.identifier) for k in raw.keys}
+    assert all(a.descritption for a in _map.ambients)
+
+
+def test_streaming_builder_drops_written_rooms():
+    output = StringIO()
+    builder = streaming.StreamingMapBuilder(streaming.JsonLinesSink(output), {'a': 1, 'b': 2, 'c': 1})
+    builder.create_passage('a', 'b', None)
+    assert 'a' not in builder.pending and builder.pending['b'] == 1
+    builder.create_passage('b', 'c', None)
+    builder.finish()
+
+    assert not builder.pending and not builder.ambient_map and not builder.passage_map
+    assert output.getvalue().count('"type": "ambient"') == 3
+
+
+def test_streaming_builder_expect():
+    output = StringIO()
+    builder = streaming.StreamingMapBuilder(streaming.JsonLinesSink(output))
+    builder.expect('a', 1)
+    builder.expect('b', 1)
+    builder.create_passage('a', 'b', None)
+    assert not builder.pending
+    builder.expect('c', 0)
+    builder.finish()
+    assert output.getvalue().count('"type": "ambient"') == 3
@@ -1,8 +1,11 @@
 from .. import text_generators
+from ..text_generators import decoration_sampling, generation_base_data
 from collections import Counter
 from pprint import pp
 from itertools import chain
 
+import random
+
 
 def test_monster_names():
     assert text_generators.monster_names is not None
@@ -137,3 +140,115 @@ def test_passage_generation():
         assert desc
         desc = passage_b.describe()
         assert desc
+
+
+def test_partial_regeneration():
+    builder = text_generators.MapBuilder()
+    builder.create_passage('a', 'b', None)
+    builder.create_passage('b', 'c', 'a')
+    for _id in 'abc':
+        builder.create_ambient(_id)
+    builder.first_ambient = 'a'
+    first = builder.build()
+    index = {a.id: i for i, a in enumerate(first.ambients)}
+
+    second = builder.reroll_ambient('b')
+    assert second.passages is first.passages
+    assert second.keys is first.keys
+    assert second.ambients[index['a']] is first.ambients[index['a']]
+    assert second.ambients[index['c']] is first.ambients[index['c']]
+    assert second.ambients[index['b']].passages == first.ambients[index['b']].passages
+
+    third = builder.reroll_passage('a', 'b')
+    assert third.keys is second.keys
+    assert third.ambients[index['c']] is second.ambients[index['c']]
+    assert len(third.passages) == len(second.passages)
+    for passage in third.passages:
+        if {passage.origin, passage.destination} == {'b', 'c'}:
+            assert passage in second.passages
+    described = {p.descritption for p in third.passages if p.origin == 'a'}
+    assert set(third.ambients[index['a']].passages) == described
+
+    fourth = builder.reroll_key('b', 'c')
+    assert fourth.ambients is third.ambients
+    assert fourth.passages is third.passages
+    assert fourth.keys[0][:2] == third.keys[0][:2]
+
+
+def test_compiled_grammar():
+    g = text_generators.CompiledGrammar({
+        'main': ['#a##b#', '#b#'],
+        'a': ['x', 'y'],
+        'b': 'z',
+        })
+    assert g.cardinality() == 3
+    assert {g.flatten() for _ in range(200)} == {'xz', 'yz', 'z'}
+
+    recursive = text_generators.CompiledGrammar({'main': ['#main##main#', 'a']})
+    assert recursive.cardinality() == float('inf')
+
+
+def test_unique_monster_names():
+    names = text_generators.unique_monster_names(5000)
+    assert len(names) == len(set(names)) == 5000
+    assert all(names)
+
+
+def test_unique_names_exhausted():
+    g = text_generators.CompiledGrammar({'main': ['#a##a#'], 'a': ['x', 'y', 'z']})
+    assert len(set(text_generators.unique_names(g, 9))) == 9
+    try:
+        text_generators.unique_names(g, 10)
+        assert False
+    except ValueError:
+        pass
+
+    g = text_generators.CompiledGrammar({'main': ['#a#', '#b#'], 'a': 'a', 'b': [str(i) for i in range(2000)]})
+    try:
+        text_generators.unique_names(g, 2001)
+        assert False
+    except ValueError:
+        pass
+
+
+def test_compiled_grammar_budget():
+    g = text_generators.CompiledGrammar({'main': '#r#', 'r': ['#r##r#', 'a']}, {'r': 2})
+    assert {g.flatten() for _ in range(500)} <= {'a', 'aa', 'aaa', 'aaaa'}
+
+    try:
+        text_generators.CompiledGrammar({'r': '#r#'}, {'r': 1})
+        assert False
+    except ValueError:
+        pass
+
+
+def test_location_names_bounded():
+    names = text_generators.location_names()
+    assert max(len(next(names)) for _ in range(2000)) < 60
+
+
+def test_batched_decorations():
+    place_type = generation_base_data._SALA
+
+    random.seed(3)
+    drawn = decoration_sampling.sample_decorations(place_type, 600)
+    numpy = decoration_sampling.numpy
+    decoration_sampling.numpy = None
+    try:
+        random.seed(3)
+        assert decoration_sampling.sample_decorations(place_type, 600) == drawn
+    finally:
+        decoration_sampling.numpy = numpy
+
+    for decorations in drawn:
+        assert generation_base_data._SOFA in decorations
+        assert generation_base_data._LAREIRA in decorations
+        assert all(any(d in slot for slot in place_type.decorations) for d in decorations)
+    lustres = sum(generation_base_data._LUSTRE in d for d in drawn)
+    assert 150 < lustres < 250
+
+    random.seed(3)
+    batches = decoration_sampling.sample_decorations(place_type, 2) + decoration_sampling.sample_decorations(place_type, 4)
+    sampler = decoration_sampling.DecorationSampler(batch=2)
+    random.seed(3)
+    assert [sampler.next(place_type) for _ in range(6)] == batches
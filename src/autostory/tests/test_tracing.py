@@ -0,0 +1,52 @@
+import json
+
+from .. import tracing, build_map, raw
+
+
+class _ListSink(list):
+    def emit(self, event):
+        self.append(event)
+
+
+def test_spans():
+    assert tracing.span('raw') is tracing.span('other')
+
+    sink = _ListSink()
+    previous = tracing.install(sink)
+    try:
+        build_map(raw(3, 4))
+    finally:
+        tracing.install(previous)
+
+    names = {e.name for e in sink}
+    assert {'raw', 'create_passage', 'create_ambient', 'build', 'freeze', 'describe'} <= names
+
+    # begin and end events nest
+    stack = list()
+    for event in sink:
+        if event.phase == 'B':
+            stack.append(event.name)
+        else:
+            assert stack.pop() == event.name
+    assert not stack
+
+    assert sink[0].attributes == {'size': 3, 'size_factor': 4}
+    assert all('grammar_cache_hit' in e.attributes for e in sink if e.name == 'describe' and e.phase == 'B')
+
+
+def test_chrome_trace_writer(tmp_path):
+    path = tmp_path/'trace.json'
+    with tracing.ChromeTraceWriter(path) as writer:
+        previous = tracing.install(writer)
+        try:
+            with tracing.span('outer', size=3) as span:
+                with tracing.span('inner'):
+                    pass
+                span.set(done=True)
+        finally:
+            tracing.install(previous)
+
+    events = json.loads(path.read_text())
+    assert [(e['name'], e['ph']) for e in events] == [
+            ('outer', 'B'), ('inner', 'B'), ('inner', 'E'), ('outer', 'E')]
+    assert events[0]['args'] == {'size': 3} and events[-1]['args'] == {'done': True}
@@ -10,6 +10,12 @@ from .text_generators import (
         monster_names,
         )
 
+from .name_generators import (
+        CompiledGrammar,
+        unique_monster_names,
+        unique_names,
+        )
+
 from .word_types import (
         Adjective,
         Substantive,
@@ -0,0 +1,113 @@
+from array import array
+from random import getrandbits
+from typing import NamedTuple, Tuple, Optional, Dict, List
+
+import sys
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .generation_base_data import (
+        _DecorationItemType,
+        _PlaceType,
+        )
+
+
+__doc__ = '''
+Draws the decorations of many places of a type at once.
+
+The decoration slots of a `_PlaceType` repeat options to weight them, a
+`(None, None, _LUSTRE)` slot has a lustre one time in three. Every place
+type gets a table, once, with its slots that always give the same thing
+apart from the ones with a choice. A batch then takes one
+`random.getrandbits` call, 32 bits per draw, turned into an option of each
+slot by a multiply and shift, with NumPy for big batches when it is
+installed. Both ways give the same draws for the same random state, so
+seeded maps do not depend on NumPy being there.
+
+`DecorationSampler` keeps a buffer of drawn sets per place type, for
+`Place.make`, its batches growing with the number of places of the type.
+'''
+
+
+_NUMPY_BATCH = 256
+_MAX_BATCH = 1024
+
+
+class _DecorationTable(NamedTuple):
+    slots: Tuple[Tuple[Optional[_DecorationItemType], ...], ...]
+    # the slots with more than one option, their draws are the only random ones
+    random_slots: Tuple[int, ...]
+
+    @classmethod
+    def make(cls, place_type: _PlaceType) -> '_DecorationTable':
+        slots = tuple(tuple(slot) for slot in place_type.decorations if slot)
+        random_slots = tuple(i for i, slot in enumerate(slots) if len(set(slot)) > 1)
+        return cls(slots, random_slots)
+
+
+# by id, hashing a place type hashes every nested type and flavor in it;
+# the type is kept next to its table so its id is never reused
+_TABLES: Dict[int, Tuple[_PlaceType, _DecorationTable]] = dict()
+
+
+def table(place_type: _PlaceType) -> _DecorationTable:
+    try:
+        return _TABLES[id(place_type)][1]
+    except KeyError:
+        return _TABLES.setdefault(id(place_type), (place_type, _DecorationTable.make(place_type)))[1]
+
+
+def _words(count) -> array:
+    # `count` random 32 bit words, in the same order on any platform
+    words = array('I', getrandbits(32*count).to_bytes(4*count, 'little')) if count else array('I')
+    if sys.byteorder == 'big':
+        words.byteswap()
+    return words
+
+
+def _columns(_table: _DecorationTable, count) -> List[list]:
+    width = len(_table.random_slots)
+    words = _words(count*width)
+    columns = [[slot[0]]*count for slot in _table.slots]
+
+    if numpy is not None and width and count >= _NUMPY_BATCH:
+        draws = numpy.frombuffer(words, dtype=numpy.uint32).astype(numpy.uint64).reshape(count, width)
+        lengths = numpy.array([len(_table.slots[s]) for s in _table.random_slots], dtype=numpy.uint64)
+        indexes = (draws*lengths) >> numpy.uint64(32)
+        for column, s in enumerate(_table.random_slots):
+            slot = _table.slots[s]
+            columns[s] = [slot[i] for i in indexes[:, column].tolist()]
+    else:
+        for column, s in enumerate(_table.random_slots):
+            slot = _table.slots[s]
+            length = len(slot)
+            columns[s] = [slot[(w*length) >> 32] for w in words[column::width]]
+    return columns
+
+
+def sample_decorations(place_type: _PlaceType, count) -> List[Tuple[_DecorationItemType, ...]]:
+    '''The decoration types of `count` places of `place_type`'''
+    columns = _columns(table(place_type), count)
+    return [tuple(d for d in row if d is not None) for row in zip(*columns)] if columns else [()]*count
+
+
+class DecorationSampler():
+
+    def __init__(self, batch = 8):
+        self.batch = batch
+        # by place type id, as the tables
+        self.__buffers: Dict[int, List[Tuple[_DecorationItemType, ...]]] = dict()
+        self.__batches: Dict[int, int] = dict()
+
+    def next(self, place_type: _PlaceType) -> Tuple[_DecorationItemType, ...]:
+        key = id(place_type)
+        buffer = self.__buffers.get(key)
+        if not buffer:
+            size = self.__batches.get(key, self.batch)
+            self.__batches[key] = min(2*size, _MAX_BATCH)
+            # popped from the end, reversed to keep the order they were drawn in
+            buffer = self.__buffers[key] = sample_decorations(place_type, size)[::-1]
+        return buffer.pop()
@@ -0,0 +1,170 @@
+from random import choice
+from typing import Dict, Tuple, List, Callable
+from collections import deque
+from math import inf, exp
+
+import re
+
+from .native_values import (
+        _MONSTER_NAME,
+        )
+
+
+__doc__ = '''
+Fast expansion of the plain name grammars, the ones made only of `#symbol#`
+references, without going through tracery. Used where a lot of names are
+needed at once.
+'''
+
+
+_SYMBOL = re.compile(r'#([^#]*)#')
+
+
+class CompiledGrammar():
+    '''
+    `budgets` bounds how deep a self recursive rule may nest in itself, once
+    it is spent the rule only expands to its options that do not reference
+    it, so the length and the cost of an expansion have a fixed ceiling.
+    '''
+
+    def __init__(self, raw_grammar, budgets: Dict[str, int] = None):
+        self.budgets = dict(budgets or {})
+        self.rules: Dict[str, Tuple[Tuple[Tuple[bool, str], ...], ...]] = dict()
+        for symbol, options in raw_grammar.items():
+            if isinstance(options, str):
+                options = [options]
+            self.rules[symbol] = tuple(self.__parse(o) for o in options)
+
+        self.__expanders: Dict[str, Callable[[], str]] = dict()
+        for symbol, options in self.rules.items():
+            if symbol in self.budgets:
+                self.__expanders[symbol] = self.__compile_budgeted(symbol, options, self.budgets[symbol])
+            else:
+                self.__expanders[symbol] = self.__compile_rule(options)
+
+    @staticmethod
+    def __parse(option) -> Tuple[Tuple[bool, str], ...]:
+        parts = list()
+        for i, part in enumerate(_SYMBOL.split(option)):
+            if i % 2 and ('.' in part or '[' in part):
+                raise ValueError(f'only plain #symbol# references can be compiled: {option}')
+            if part:
+                parts.append((bool(i % 2), part))
+        return tuple(parts)
+
+    # Every rule becomes a closure, an expansion is then just nested calls
+
+    def __reference(self, symbol) -> Callable[[], str]:
+        expanders = self.__expanders
+        return lambda: expanders[symbol]()
+
+    def __compile_option(self, option, inner=None) -> Callable[[], str]:
+        # `inner`, if given, maps a symbol to the closure used for it instead
+        # of the rule itself
+        inner = inner or dict()
+        parts = tuple(
+                (inner.get(value) or self.__reference(value)) if is_symbol else value
+                for is_symbol, value in option)
+        if not any(is_symbol for is_symbol, _ in option):
+            text = ''.join(parts)
+            return lambda: text
+        if len(parts) == 1:
+            return parts[0]
+        return lambda: ''.join([p if p.__class__ is str else p() for p in parts])
+
+    def __compile_rule(self, options, inner=None) -> Callable[[], str]:
+        compiled = tuple(self.__compile_option(o, inner) for o in options)
+        if len(compiled) == 1:
+            return compiled[0]
+        return lambda: choice(compiled)()
+
+    def __compile_budgeted(self, symbol, options, budget) -> Callable[[], str]:
+        # the rule is unrolled `budget` times, each level referencing the one
+        # below it, so nothing is counted while expanding
+        fallback = tuple(o for o in options if (True, symbol) not in o)
+        if not fallback:
+            raise ValueError(f'the rule {symbol} has no option to fall back to')
+        level = self.__compile_rule(fallback)
+        for _ in range(budget):
+            level = self.__compile_rule(options, {symbol: level})
+        return level
+
+    def flatten(self, symbol='main') -> str:
+        return self.__expanders[symbol]()
+
+    def cardinality(self, symbol='main', _visiting=None) -> float:
+        '''Upper bound on the distinct expansions of `symbol`, inf if recursive'''
+        _visiting = set() if _visiting is None else _visiting
+        if symbol in _visiting:
+            return inf
+        _visiting.add(symbol)
+        total = 0
+        for option in set(self.rules[symbol]):
+            product = 1
+            for is_symbol, value in option:
+                if is_symbol:
+                    product *= self.cardinality(value, _visiting)
+            total += product
+        _visiting.discard(symbol)
+        return total
+
+
+def estimate_name_space(draws, distinct) -> float:
+    '''
+    Size of a uniform name space that would give `distinct` names in `draws`
+    draws, solving distinct = N*(1 - exp(-draws/N)) for N.
+    '''
+    if distinct >= draws:
+        return inf
+    low, high = distinct, distinct
+    while high*(1 - exp(-draws/high)) < distinct:
+        high *= 2
+    for _ in range(60):
+        middle = (low + high)/2
+        if middle*(1 - exp(-draws/middle)) < distinct:
+            low = middle
+        else:
+            high = middle
+    return high
+
+
+def unique_names(grammar: CompiledGrammar, count, max_cost = 20, window = 1024) -> List[str]:
+    '''
+    `count` distinct expansions of `grammar`. Fails with ValueError, instead
+    of spinning, when the grammar can not have that many names or when the
+    repeats seen in the last `window` draws project more than `max_cost`
+    draws per name still missing.
+    '''
+    capacity = grammar.cardinality()
+    if count > capacity:
+        raise ValueError(f'the grammar has at most {capacity} names, {count} asked')
+
+    # only hashes are kept, a rare collision just costs one more draw
+    seen = set()
+    names = list()
+    recent = deque(maxlen=window)
+    draws = 0
+    while len(names) < count:
+        name = grammar.flatten()
+        draws += 1
+        key = hash(name)
+        repeated = key in seen
+        recent.append(repeated)
+        if not repeated:
+            seen.add(key)
+            names.append(name)
+        elif len(recent) == window:
+            fresh = window - sum(recent)
+            if not fresh or window/fresh > max_cost:
+                raise ValueError(
+                        f'name space nearly exhausted after {len(names)} names, '
+                        f'estimated size {estimate_name_space(draws, len(names)):.0f}')
+            recent.clear()
+    return names
+
+
+_MONSTER_GRAMMAR = CompiledGrammar(_MONSTER_NAME)
+
+
+def unique_monster_names(count, max_cost = 20) -> List[str]:
+    return unique_names(_MONSTER_GRAMMAR, count, max_cost)
@@ -52,6 +52,10 @@ _LOCATION_NAMES = {
         }
 
 
+# `silaba` is self recursive, past this depth it only expands to single syllables
+_LOCATION_NAMES_BUDGETS = {'silaba': 3}
+
+
 _MAP_BASE_DESCRIPTION ='''
     #tipo_o# #tipo# #nome# é um lugar #empty.norepeat(adjetivo_o)# com seus muros
     #empty.norepeat(adjetivo_os)# e seus portais #empty.norepeat(adjetivo_os)#. As
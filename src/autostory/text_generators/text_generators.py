@@ -9,18 +9,22 @@ from abc import ABC, abstractproperty
 from typing import Mapping, Union, Dict, List, Callable, Any, Tuple
 from typing import Set, Iterable
 
-from functools import partial, lru_cache
+from functools import partial, wraps
 from itertools import chain
 from collections import defaultdict
+from threading import local
 
 from dataclass_abc import dataclass_abc
-from dataclasses import field, dataclass
+from dataclasses import field, dataclass, replace
 
 from .. import datamodels
+from ..profiling import profiled
+from .. import tracing
 
 from .native_values import (
         _INTRO_LETTER,
         _LOCATION_NAMES,
+        _LOCATION_NAMES_BUDGETS,
         _MAP_BASE_DESCRIPTION,
         _MONSTER_NAME,
         _PASSAGE_BASE_DESCRIPTION,
@@ -32,6 +36,14 @@ from .word_types import (
         Adjective,
         )
 
+from .name_generators import (
+        CompiledGrammar,
+        )
+
+from .decoration_sampling import (
+        DecorationSampler,
+        )
+
 from .generation_base_data import (
         _PlaceType,
         _Flavor,
@@ -57,13 +69,43 @@ def intro_letter() -> str:
 
 
 def location_names() -> str:
-    g = Grammar(_LOCATION_NAMES)
+    g = CompiledGrammar(_LOCATION_NAMES, _LOCATION_NAMES_BUDGETS)
     while True:
-        yield g.flatten('#main#')
+        yield g.flatten('main')
 
 
 RAW_GRAMMAR_TYPE = Dict[str, Union[str, List[str]]]
 
+
+_THREAD_SOURCES = local()
+
+
+def _per_thread(source):
+    # name generators can not be advanced by two threads at once, every
+    # thread gets its own instance of each
+    try:
+        return getattr(_THREAD_SOURCES, source.__name__)
+    except AttributeError:
+        instance = source()
+        setattr(_THREAD_SOURCES, source.__name__, instance)
+        return instance
+
+
+def _cached(method):
+    # cached in the instance, an lru_cache would be shared between equal
+    # objects of different contexts and threads
+    attribute = f'_cached_{method.__name__}'
+
+    @wraps(method)
+    def wrapper(self):
+        try:
+            return self.__dict__[attribute]
+        except KeyError:
+            value = self.__dict__[attribute] = method(self)
+            return value
+    return wrapper
+
+
 @dataclass_abc
 class GrammerMakebla(ABC):
     __frozen: bool = field(init=False, default=False)
@@ -72,6 +114,9 @@ class GrammerMakebla(ABC):
         self.__frozen = True
         descritption = self.describe()
         self.describe = lambda: descritption
+        # the grammar is only there to describe, and it is a web of cycles
+        # left to the garbage collector
+        self.__dict__.pop('_cached_grammar', None)
 
     @abstractproperty
     def context(self) -> 'Context':
@@ -86,7 +131,7 @@ class GrammerMakebla(ABC):
         pass
 
     @property
-    @lru_cache
+    @_cached
     def grammar(self) -> Grammar:
         g = Grammar(self.raw_grammar)
         g.add_modifiers(self.context.make_modifires(g))
@@ -94,6 +139,15 @@ class GrammerMakebla(ABC):
 
     
     def describe(self) -> str:
+        if not tracing.enabled():
+            return self._describe()
+        with tracing.span(
+                'describe',
+                kind = type(self).__name__,
+                grammar_cache_hit = '_cached_grammar' in self.__dict__):
+            return self._describe()
+
+    def _describe(self) -> str:
         desc = self.grammar.flatten(self.base_description)
         return desc.replace('\n', ' ').replace('  ', ' ').replace(' .', '.').strip()
 
@@ -109,8 +163,6 @@ class Map(GrammerMakebla):
     def base_description(self) -> str:
         return _MAP_BASE_DESCRIPTION
 
-    _LOCATION_NAMES_GENERATOR = location_names()
-
     @classmethod
     def _composed_map_flavor(cls):
         return _Flavor.join(*sample(_MAP_FLAVOR_LIST, 3))
@@ -119,7 +171,7 @@ class Map(GrammerMakebla):
     def make(cls, context):
         base_type: '_MapType' = _MAP_TYPE
         flavor: '_Flavor' = cls._composed_map_flavor()
-        name: str = next(cls._LOCATION_NAMES_GENERATOR)
+        name: str = next(_per_thread(location_names))
 
         return cls(
                 context = context,
@@ -128,7 +180,7 @@ class Map(GrammerMakebla):
                 name=name)
 
     @property
-    @lru_cache
+    @_cached
     def raw_grammar(self):
         return {
                 'empty': '',
@@ -148,12 +200,12 @@ class DecorationItem(GrammerMakebla):
         return '#main#'
 
     @property
-    @lru_cache
+    @_cached
     def desc(self):
         return self.decoration_type.desc
 
     @property
-    @lru_cache
+    @_cached
     def raw_grammar(self):
         deco = self.decoration_type
         return {
@@ -184,7 +236,7 @@ class Place(GrammerMakebla):
         flavor_sec = choice(_PLACE_FLAVOR_LIST)
         flavor_ter = choice(_SECONDATY_PLACE_FLAVOR_LIST)
 
-        decorations = tuple(DecorationItem(deco, context) for deco in map(choice, place_type.decorations) if deco is not None)
+        decorations = tuple(DecorationItem(deco, context) for deco in context.decoration_sampler.next(place_type))
 
         return cls(
                 context = context,
@@ -196,7 +248,7 @@ class Place(GrammerMakebla):
                 )
 
     @property
-    @lru_cache
+    @_cached
     def nome(self) -> Substantive:
         return self.place_type.desc
 
@@ -260,8 +312,9 @@ class Passage(GrammerMakebla):
         return '#desc#'
 
     @classmethod
-    def make(cls, passage_type: _PassageType, context: 'Context') -> Tuple['Passage', 'Passage']:
-        flavor = choice(passage_type.flavor_list)
+    def make(cls, passage_type: _PassageType, context: 'Context', flavor: _Flavor = None) -> Tuple['Passage', 'Passage']:
+        if flavor is None:
+            flavor = choice(passage_type.flavor_list)
         return (cls(context = context,
                     nome = passage_type.a_side,
                     flavor = flavor,
@@ -328,6 +381,7 @@ class Context():
         self.place_type_set: Set['_PlaceType'] = set()
         self._norepeat_said = set()
         self._norepeat_map = list()
+        self.decoration_sampler = DecorationSampler()
 
     def make_modifires(self, grammar: Grammar):
         return self.ContextualModifiers(grammar, self)
@@ -336,7 +390,9 @@ class Context():
         option_set = set(options)
         if option_set <= self._norepeat_said:
             self._reset_norepeat_said(option_set)
-        text = choice(tuple(set(options) - self._norepeat_said))
+        # options are deduplicated in order, set iteration would depend on the
+        # string hash seed and break seeded generation across processes
+        text = choice(tuple(o for o in dict.fromkeys(options) if o not in self._norepeat_said))
         self._update_norepeat_said(text)
         return text
 
@@ -367,14 +423,15 @@ class Context():
     def map_type(self) -> _MapType:
         return self.map.base_type
 
-    def __choose_place_type(self) -> '_PlaceType':
+    def choose_place_type(self) -> '_PlaceType':
         can_repeat_func = lambda t: t.repeat or not t in self.place_type_set
         possible_place_type_tuple = tuple(filter(can_repeat_func, self.map_type.place_types))
         place_type = choice(possible_place_type_tuple) 
         return place_type
 
-    def make_place(self, passages=tuple()) -> Place:
-        place_type = self.__choose_place_type()
+    def make_place(self, passages=tuple(), place_type=None) -> Place:
+        if place_type is None:
+            place_type = self.choose_place_type()
         place = Place.make(place_type, self, passages)
 
         self.place_type_set.add(place.place_type)
@@ -406,10 +463,8 @@ class MapBuilder():
         
         self.used_ambient_types = set()
 
-    def create_passage(self, _from, _to, _where):
-        locked = bool(_where)
-
-        types_available = set(self.context.map_type.passage_types) - self.used_ambient_types
+    def choose_passage_type(self, locked) -> _PassageType:
+        types_available = tuple(t for t in self.context.map_type.passage_types if t not in self.used_ambient_types)
 
         if (locked):
             types_available = tuple(t for t in types_available if t.key_type)
@@ -424,28 +479,48 @@ class MapBuilder():
 
         passage_type = choice(types_available)
         self.used_ambient_types.add(passage_type)
-        a_side, b_side = Passage.make(passage_type, self.context)
+        return passage_type
+
+    def create_passage(self, _from, _to, _where, passage_type=None, flavor=None):
+        with tracing.span('create_passage', origin=_from, destination=_to, locked=bool(_where)):
+            self._create_passage(_from, _to, _where, passage_type, flavor)
+
+    def _create_passage(self, _from, _to, _where, passage_type, flavor):
+        locked = bool(_where)
+
+        if passage_type is None:
+            passage_type = self.choose_passage_type(locked)
+        a_side, b_side = Passage.make(passage_type, self.context, flavor)
 
         self.passage_map[_from][_to] = a_side
         self.passage_map[_to][_from] = b_side
 
         if bool(locked):
             self.key_map[(_from, _to)] = Key.make(passage_type, self.context)
-            self.key_place_map[(_from, _to)] = _where.position.identifier
-
-    def create_ambient(self, _id):
-        passages = tuple(self.passage_map[_id].values())
-        ambient = self.context.make_place(passages)
-        self.ambient_map[_id] = ambient
-
-    def build(self) -> datamodels.Map:
-
-        for (f_id, f_inst), (t_id, t_inst) in self.passage_map.iter_pairs():
-            f_inst.freeze()
-            t_inst.freeze()
-
-        for ambient in self.ambient_map.values():
-            ambient.freeze()
+            # `_where` is the raw key or, for already laid out maps, its place id
+            place = _where if isinstance(_where, str) else _where.position.identifier
+            self.key_place_map[(_from, _to)] = place
+
+    def create_ambient(self, _id, place_type=None):
+        with tracing.span('create_ambient', ambient=_id) as span:
+            passages = tuple(self.passage_map[_id].values())
+            ambient = self.context.make_place(passages, place_type)
+            self.ambient_map[_id] = ambient
+            span.set(place_type=ambient.place_type.desc.word, decorations=len(ambient.decorations))
+
+    def build_parts(self, deadline=None) -> Tuple[Tuple[datamodels.Ambient, ...], Tuple[datamodels.Passage, ...], Tuple[datamodels.Key, ...]]:
+
+        with tracing.span('freeze', ambients=len(self.ambient_map), keys=len(self.key_map)):
+            for (f_id, f_inst), (t_id, t_inst) in self.passage_map.iter_pairs():
+                if deadline is not None:
+                    deadline.check('passages')
+                f_inst.freeze()
+                t_inst.freeze()
+
+            for ambient in self.ambient_map.values():
+                if deadline is not None:
+                    deadline.check('ambients')
+                ambient.freeze()
 
         passage_list = list()
         for (f_id, f_inst), (t_id, t_inst) in self.passage_map.iter_pairs():
@@ -454,37 +529,146 @@ class MapBuilder():
 
         ambient_list = list()
         for _id, _inst in self.ambient_map.items():
-            decoration_list = list()
-            for deco in _inst.decorations:
-                decoration_list.append(deco.describe())
-
-            sub_passage_list = list()
-            for passage in _inst.passages:
-                sub_passage_list.append(passage.describe())
-
-            ambient = datamodels.Ambient(
-                    id=_id,
-                    descritption = _inst.describe(),
-                    passages = tuple(sub_passage_list),
-                    decorations = tuple(decoration_list),
-                    )
-            ambient_list.append(ambient)
+            ambient_list.append(self._ambient_model(_id, _inst))
 
         keys = list()
         for (_from, _to), inst in self.key_map.items():
-            keys.append(datamodels.Key(
+            keys.append(self._key_model(_from, _to, inst))
+
+        return tuple(ambient_list), tuple(passage_list), tuple(keys)
+
+    def _ambient_model(self, _id, _inst) -> datamodels.Ambient:
+        decoration_list = list()
+        for deco in _inst.decorations:
+            decoration_list.append(deco.describe())
+
+        sub_passage_list = list()
+        for passage in _inst.passages:
+            sub_passage_list.append(passage.describe())
+
+        return datamodels.Ambient(
+                id=_id,
+                descritption = _inst.describe(),
+                passages = tuple(sub_passage_list),
+                decorations = tuple(decoration_list),
+                )
+
+    def _key_model(self, _from, _to, inst) -> datamodels.Key:
+        return datamodels.Key(
                 _to,
                 self.key_place_map[(_from, _to)],
                 inst.describe(),
-                ))
-        
-        return datamodels.Map(
-                    introducion_letter = next(intro_letter()),
+                _from,
+                )
+
+    @profiled('build')
+    def build(self, deadline=None) -> datamodels.Map:
+        with tracing.span('build', ambients=len(self.ambient_map)):
+            ambients, passages, keys = self.build_parts(deadline)
+
+        self.built = datamodels.Map(
+                    introducion_letter = next(_per_thread(intro_letter)),
                     name = self.context.map.name,
                     descritption = self.context.map.describe(),
                     first_ambient = self.first_ambient,
-                    ambients = tuple(ambient_list),
-                    passages = tuple(passage_list),
-                    keys = tuple(keys)
+                    ambients = ambients,
+                    passages = passages,
+                    keys = keys
                 )
+        self._ambient_index = {a.id: i for i, a in enumerate(ambients)}
+        self._passage_index = {(p.origin, p.destination): i for i, p in enumerate(passages)}
+        self._key_index = {(k.origin, k.destination): i for i, k in enumerate(keys)}
+        return self.built
+
+    def build_names(self) -> datamodels.Map:
+        # no grammar is flattened, only the nouns of the chosen types are used
+        passages = tuple(
+                datamodels.Passage(_to, _from, inst.nome.word)
+                for _from, sub_dict in self.passage_map.items()
+                for _to, inst in sub_dict.items())
+
+        ambients = tuple(
+                datamodels.Ambient(
+                    id = _id,
+                    descritption = inst.nome.word,
+                    passages = tuple(p.nome.word for p in inst.passages),
+                    decorations = tuple(d.desc.word for d in inst.decorations),
+                    )
+                for _id, inst in self.ambient_map.items())
+
+        keys = tuple(
+                datamodels.Key(_to, self.key_place_map[(_from, _to)], inst.desc.word, _from)
+                for (_from, _to), inst in self.key_map.items())
+
+        return datamodels.Map(
+                    introducion_letter = '',
+                    name = self.context.map.name,
+                    descritption = '',
+                    first_ambient = self.first_ambient,
+                    ambients = ambients,
+                    passages = passages,
+                    keys = keys
+                )
+
+    # Partial regeneration, only valid after `build`. The norepeat state of the
+    # context is kept from the build, the returned map shares every tuple
+    # that was not touched with the previous one.
+
+    @staticmethod
+    def _replaced(items, changes):
+        if not changes:
+            return items
+        items = list(items)
+        for i, item in changes.items():
+            items[i] = item
+        return tuple(items)
+
+    def _rebuild_ambients(self, ids):
+        changes = dict()
+        for _id in ids:
+            place = replace(
+                    self.ambient_map[_id],
+                    passages = tuple(self.passage_map[_id].values()))
+            place.freeze()
+            self.ambient_map[_id] = place
+            changes[self._ambient_index[_id]] = self._ambient_model(_id, place)
+        return self._replaced(self.built.ambients, changes)
+
+    def reroll_ambient(self, _id) -> datamodels.Map:
+        old = self.ambient_map[_id]
+        place = self.context.make_place(old.passages, old.place_type)
+        place.freeze()
+        self.ambient_map[_id] = place
+
+        ambient = self._ambient_model(_id, place)
+        self.built = self.built._replace(ambients=self._replaced(
+            self.built.ambients, {self._ambient_index[_id]: ambient}))
+        return self.built
+
+    def reroll_passage(self, _from, _to) -> datamodels.Map:
+        old = self.passage_map[_from][_to]
+        a_side, b_side = Passage.make(old.passage_type, self.context)
+        a_side.freeze()
+        b_side.freeze()
+        self.passage_map[_from][_to] = a_side
+        self.passage_map[_to][_from] = b_side
+
+        passages = self._replaced(self.built.passages, {
+            self._passage_index[(_from, _to)]: datamodels.Passage(_to, _from, a_side.describe()),
+            self._passage_index[(_to, _from)]: datamodels.Passage(_from, _to, b_side.describe()),
+            })
+        # the description of a room lists its passages
+        ambients = self._rebuild_ambients(i for i in (_from, _to) if i in self.ambient_map)
+
+        self.built = self.built._replace(ambients=ambients, passages=passages)
+        return self.built
+
+    def reroll_key(self, _from, _to) -> datamodels.Map:
+        inst = Key.make(self.passage_map[_from][_to].passage_type, self.context)
+        inst.freeze()
+        self.key_map[(_from, _to)] = inst
+
+        self.built = self.built._replace(keys=self._replaced(
+            self.built.keys, {self._key_index[(_from, _to)]: self._key_model(_from, _to, inst)}))
+        return self.built
 
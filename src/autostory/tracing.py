@@ -0,0 +1,128 @@
+from time import perf_counter_ns
+from threading import get_ident, Lock
+from typing import NamedTuple, Mapping
+
+import json
+import os
+
+
+__doc__ = '''
+Begin and end events for the spans of a generation, raw graph, passages,
+rooms, freezing, descriptions and serialization, sent to the installed sink.
+
+    with tracing.span('create_ambient', ambient=_id) as span:
+        ...
+        span.set(decorations=3)
+
+With no sink installed `span` hands back a shared no-op span, the cost is a
+function call. Code on the hottest paths checks `enabled()` first, so it
+does not even build the attributes.
+
+A sink is any object with an `emit(event)` method, `ChromeTraceWriter` writes
+the events to a file that chrome://tracing and Perfetto open.
+'''
+
+
+class Event(NamedTuple):
+    phase: str          # 'B' begin or 'E' end
+    name: str
+    timestamp: int      # perf_counter_ns
+    thread: int
+    attributes: Mapping[str, object]
+
+
+class _NullSpan():
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return None
+
+    def set(self, **attributes):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span():
+    __slots__ = ('sink', 'name', 'attributes')
+
+    def __init__(self, sink, name, attributes):
+        self.sink = sink
+        self.name = name
+        self.attributes = attributes
+
+    def __enter__(self):
+        self.sink.emit(Event('B', self.name, perf_counter_ns(), get_ident(), self.attributes))
+        self.attributes = dict()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is not None:
+            self.attributes['error'] = exc_type.__name__
+        self.sink.emit(Event('E', self.name, perf_counter_ns(), get_ident(), self.attributes))
+        return None
+
+    def set(self, **attributes):
+        # attributes only known at the end of the span
+        self.attributes.update(attributes)
+
+
+_SINK = None
+
+
+def install(sink):
+    '''Sends the spans to `sink`, None turns tracing off. Returns the previous sink'''
+    global _SINK
+    previous, _SINK = _SINK, sink
+    return previous
+
+
+def enabled() -> bool:
+    return _SINK is not None
+
+
+def span(name, **attributes):
+    if _SINK is None:
+        return _NULL_SPAN
+    return _Span(_SINK, name, attributes)
+
+
+class ChromeTraceWriter():
+    '''Trace event format json, written as the events come'''
+
+    def __init__(self, path):
+        self.file = open(path, 'w')
+        self.file.write('[')
+        self.separator = '\n'
+        self.pid = os.getpid()
+        self.lock = Lock()
+
+    def emit(self, event: Event):
+        record = {
+                'name': event.name,
+                'ph': event.phase,
+                'ts': event.timestamp/1000,
+                'pid': self.pid,
+                'tid': event.thread,
+                'args': {k: v if isinstance(v, (int, float, bool)) else str(v)
+                    for k, v in event.attributes.items()},
+                }
+        text = json.dumps(record, ensure_ascii=False)
+        with self.lock:
+            self.file.write(self.separator + text)
+            self.separator = ',\n'
+
+    def close(self):
+        with self.lock:
+            if not self.file.closed:
+                self.file.write('\n]\n')
+                self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()